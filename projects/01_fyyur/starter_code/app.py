@@ -4,17 +4,26 @@
 
 import json
 import dateutil.parser
-import babel
+import babel.dates
 import sys
-from datetime import datetime
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import time
+import click
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import groupby
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.orm import load_only
+from werkzeug.datastructures import MultiDict
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
+from search import NgramIndex, SEARCH_PAGE_SIZE
+from importer import iter_records, chunked, as_list, as_bool, Checkpoint
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -47,8 +56,14 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(500))
     image_link = db.Column(db.String(500))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref='venue')
 
+    __table_args__ = (
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 class Artist(db.Model):
@@ -65,8 +80,14 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(500))
     image_link = db.Column(db.String(500))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref='artist')
 
+    __table_args__ = (
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
@@ -75,28 +96,416 @@ class Show(db.Model):
     __tablename__ = 'shows'
 
     id = db.Column(db.Integer, primary_key=True)
-    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
-    venue_name = db.Column(db.String)
-    venue_image_link = db.Column(db.String(500))
-    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
-    artist_name = db.Column(db.String)
-    artist_image_link = db.Column(db.String(500))
-    start_time = db.Column(db.String(50))
+    # active_history: the old venue/artist id is loaded before it is overwritten, even when the
+    # instance was expired by a commit, so recount_updated_show can recount the venue/artist it left.
+    venue_id = db.column_property(db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False), active_history=True)
+    artist_id = db.column_property(db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False), active_history=True)
+    start_time = db.Column(db.DateTime(timezone=True))
+
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+    )
+
+class ShowCounterRollover(db.Model):
+    # Single row: the instant up to which venue/artist show counters have been split into upcoming and past.
+    __tablename__ = 'show_counter_rollovers'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_at = db.Column(db.DateTime(timezone=True), nullable=False)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format="EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format="EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+    # Babel parses the pattern and loads the locale once per (format, locale) pair.
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+def parse_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        # Fast path: start_time values are ISO 8601.
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return dateutil.parser.parse(value)
+
+@lru_cache(maxsize=4096)
+def format_datetime(value, format='medium', locale=babel.dates.LC_TIME):
+    date = parse_datetime(value)
+    if date.tzinfo is None:
+        # Same as babel.dates.format_datetime: naive values are UTC.
+        date = date.replace(tzinfo=timezone.utc)
+    if format in ('short', 'long'):
+        return babel.dates.format_datetime(date, format, locale=locale)
+    pattern, locale = datetime_pattern(format, locale)
+    return pattern.apply(date, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# In-process trigram indexes, only built when the database has no pg_trgm (e.g. SQLite).
+name_indexes = {}
+
+def name_index(model):
+    if model not in name_indexes:
+        index = NgramIndex()
+        for id, name in db.session.query(model.id, model.name):
+            index.add(id, name)
+        name_indexes[model] = index
+    return name_indexes[model]
+
+def index_name(mapper, connection, target):
+    index = name_indexes.get(type(target))
+    if index is not None:
+        index.add(target.id, target.name)
+
+def unindex_name(mapper, connection, target):
+    index = name_indexes.get(type(target))
+    if index is not None:
+        index.remove(target.id)
+
+for model in (Venue, Artist):
+    event.listen(model, 'after_insert', index_name)
+    event.listen(model, 'after_update', index_name)
+    event.listen(model, 'after_delete', unindex_name)
+
+def search_by_name(model, term, limit=SEARCH_PAGE_SIZE, offset=0):
+    # Returns (total number of matches, matching rows of the requested page), best match first.
+    # limit and offset come from the query string: a page is 1 to SEARCH_PAGE_SIZE rows, never before the first.
+    limit = min(max(limit, 1), SEARCH_PAGE_SIZE)
+    offset = max(offset, 0)
+    if db.engine.dialect.name == 'postgresql':
+        # ilike '%term%' and similarity() are both served by the pg_trgm GIN index.
+        query = model.query.filter(model.name.ilike("%{}%".format(term)))
+        total = query.count()
+        results = query.order_by(
+            db.func.similarity(model.name, term).desc(), model.name, model.id
+        ).limit(limit).offset(offset).all()
+        return total, results
+
+    total, ids = name_index(model).search(term, limit, offset)
+    rows = {row.id: row for row in model.query.filter(model.id.in_(ids))} if ids else {}
+    # The index can still hold rows deleted behind its back (another worker, raw SQL, a rollback).
+    stale = [id for id in ids if id not in rows]
+    if stale:
+        index = name_index(model)
+        for id in stale:
+            index.remove(id)
+    return total - len(stale), [rows[id] for id in ids if id in rows]
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venue and Artist carry upcoming_shows_count / past_shows_count so listings never aggregate shows.
+# Show inserts and deletes adjust them in the same transaction; `flask rollover-shows` moves shows
+# whose start time has passed from upcoming to past, and `flask rebuild-show-counters` recomputes everything.
+
+def as_aware(value):
+    # Naive datetimes (e.g. from SQLite or an unzoned form value) are taken as local time.
+    return value if value.tzinfo is not None else value.astimezone()
+
+def rolled_at(connection):
+    return connection.execute(db.select(ShowCounterRollover.rolled_at)).scalar()
+
+def adjust_show_counters(connection, show, delta):
+    if show.start_time is None:
+        return
+    # Split against the last rollover so a later rollover accounts for every show exactly once.
+    mark = rolled_at(connection) or datetime.now(timezone.utc)
+    column = 'upcoming_shows_count' if as_aware(show.start_time) > as_aware(mark) else 'past_shows_count'
+    for table, id in ((Venue.__table__, show.venue_id), (Artist.__table__, show.artist_id)):
+        connection.execute(
+            table.update().where(table.c.id == id).values({column: table.c[column] + delta})
+        )
+
+def refresh_show_counters(connection, mark, venue_ids=None, artist_ids=None):
+    # Recomputes both counters from shows, for the given ids or for every row when ids is None.
+    for model, column, ids in ((Venue, Show.venue_id, venue_ids), (Artist, Show.artist_id, artist_ids)):
+        if ids is not None and not ids:
+            continue
+        shows = db.select(db.func.count(Show.id)).where(column == model.id)
+        statement = model.__table__.update().values(
+            upcoming_shows_count=shows.where(Show.start_time > mark).scalar_subquery(),
+            past_shows_count=shows.where(Show.start_time <= mark).scalar_subquery()
+        )
+        if ids is not None:
+            statement = statement.where(model.id.in_(ids))
+        connection.execute(statement)
+
+def set_rolled_at(connection, mark):
+    table = ShowCounterRollover.__table__
+    if connection.execute(table.update().values(rolled_at=mark)).rowcount == 0:
+        connection.execute(table.insert().values(rolled_at=mark))
+
+@event.listens_for(Show, 'after_insert')
+def count_inserted_show(mapper, connection, target):
+    adjust_show_counters(connection, target, 1)
+
+@event.listens_for(Show, 'after_delete')
+def uncount_deleted_show(mapper, connection, target):
+    adjust_show_counters(connection, target, -1)
+
+@event.listens_for(Show, 'after_update')
+def recount_updated_show(mapper, connection, target):
+    venue_ids = set([target.venue_id])
+    artist_ids = set([target.artist_id])
+    for attribute, ids in (('venue_id', venue_ids), ('artist_id', artist_ids)):
+        ids.update(db.inspect(target).attrs[attribute].history.deleted)
+    mark = rolled_at(connection) or datetime.now(timezone.utc)
+    refresh_show_counters(connection, mark, venue_ids, artist_ids)
+
+@app.cli.command('rollover-shows')
+def rollover_shows():
+    """Move shows that have started since the last rollover from upcoming to past."""
+    now = datetime.now(timezone.utc)
+    with db.engine.begin() as connection:
+        mark = rolled_at(connection)
+        if mark is None:
+            refresh_show_counters(connection, now)
+        else:
+            started = db.select(Show.venue_id, Show.artist_id).where(
+                Show.start_time > mark, Show.start_time <= now
+            )
+            rows = connection.execute(started).fetchall()
+            refresh_show_counters(
+                connection, now,
+                set(row.venue_id for row in rows),
+                set(row.artist_id for row in rows)
+            )
+        set_rolled_at(connection, now)
+    print('Show counters rolled over to {}.'.format(now.isoformat()))
+
+@app.cli.command('rebuild-show-counters')
+def rebuild_show_counters():
+    """Check every venue and artist show counter and rebuild them all in bulk."""
+    now = datetime.now(timezone.utc)
+    with db.engine.begin() as connection:
+        for model, column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+            shows = db.select(db.func.count(Show.id)).where(column == model.id)
+            stale = db.select(db.func.count(model.id)).where(db.or_(
+                model.upcoming_shows_count != shows.where(Show.start_time > now).scalar_subquery(),
+                model.past_shows_count != shows.where(Show.start_time <= now).scalar_subquery()
+            ))
+            print('{}: {} stale counter rows.'.format(model.__tablename__, connection.execute(stale).scalar()))
+        refresh_show_counters(connection, now)
+        set_rolled_at(connection, now)
+    print('Show counters rebuilt.')
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+
+IMPORTS = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ShowForm),
+}
+
+COUNTER_COLUMNS = ('upcoming_shows_count', 'past_shows_count')
+
+@lru_cache(maxsize=None)
+def insert_defaults(model):
+    # Every insertable column with its default (or None): an executemany takes its columns from the
+    # first row, so every row of a chunk must carry the same keys, whatever its record left out.
+    return dict(
+        (column.key, column.default.arg if column.default is not None and column.default.is_scalar else None)
+        for column in model.__table__.columns if column.key != 'id'
+    )
+
+def import_row(kind, record):
+    # Returns (row for the insert, None) or (None, form errors), checked with the same form as the web page.
+    if not isinstance(record, dict):
+        return None, {'record': ['Not a JSON object.']}
+    model, form_class = IMPORTS[kind]
+    defaults = insert_defaults(model)
+    supplied = dict((key, value) for key, value in record.items() if key in defaults and key not in COUNTER_COLUMNS)
+    row = dict(defaults, **supplied)
+    formdata = MultiDict(dict((key, value) for key, value in supplied.items() if key != 'genres'))
+
+    if kind == 'shows':
+        # ShowForm leaves the ids unvalidated, so they are checked here before the IN query relies on them.
+        for key in ('artist_id', 'venue_id'):
+            try:
+                row[key] = int(row[key])
+            except (KeyError, TypeError, ValueError):
+                return None, {key: ['Not a valid integer value.']}
+        try:
+            row['start_time'] = parse_datetime(row.get('start_time') or '')
+        except (TypeError, ValueError, OverflowError):
+            return None, {'start_time': ['Not a valid datetime value.']}
+        formdata['start_time'] = row['start_time'].strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        row['genres'] = as_list(row.get('genres'))
+        formdata.setlist('genres', row['genres'])
+        for flag in ('seeking_talent', 'seeking_venue'):
+            if flag in supplied:
+                row[flag] = as_bool(row[flag])
+
+    form = form_class(formdata=formdata, meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    return row, None
+
+def missing_references(connection, rows):
+    # Ids of rows whose artist or venue does not exist, resolved with one IN query per side.
+    missing = set()
+    for model, key in ((Artist, 'artist_id'), (Venue, 'venue_id')):
+        wanted = set(row[key] for row in rows)
+        found = set(id for id, in connection.execute(db.select(model.id).where(model.id.in_(wanted))))
+        missing.update(i for i, row in enumerate(rows) if row[key] not in found)
+    return missing
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows validated and inserted per transaction.')
+@click.option('--checkpoint', default=None, help='Resume file (default: PATH.checkpoint).')
+def import_records(kind, path, chunk_size, checkpoint):
+    """Bulk-load venues, artists or shows from a CSV or NDJSON file."""
+    model = IMPORTS[kind][0]
+    checkpoint = Checkpoint(checkpoint or path + '.checkpoint', path)
+    done = checkpoint.done
+    records = iter_records(path)
+    if done:
+        print('Resuming after {} records.'.format(done))
+        for _ in zip(range(done), records):
+            pass
+
+    imported = rejected = 0
+    started = time.time()
+    for chunk in chunked(records, chunk_size):
+        rows = []
+        for number, record in enumerate(chunk, done + 1):
+            row, errors = import_row(kind, record)
+            if errors:
+                rejected += 1
+                print('record {}: {}'.format(number, errors))
+            else:
+                rows.append(row)
+
+        with db.engine.begin() as connection:
+            if kind == 'shows' and rows:
+                missing = missing_references(connection, rows)
+                for i in sorted(missing):
+                    print('record with artist_id {} / venue_id {}: unknown artist or venue'.format(
+                        rows[i]['artist_id'], rows[i]['venue_id']))
+                rejected += len(missing)
+                rows = [row for i, row in enumerate(rows) if i not in missing]
+            if rows:
+                # executemany; bypasses the ORM, so counters are refreshed below for the touched rows.
+                connection.execute(model.__table__.insert(), rows)
+                if kind == 'shows':
+                    refresh_show_counters(
+                        connection, rolled_at(connection) or datetime.now(timezone.utc),
+                        set(row['venue_id'] for row in rows),
+                        set(row['artist_id'] for row in rows)
+                    )
+
+        done += len(chunk)
+        imported += len(rows)
+        checkpoint.save(done)
+        print('{} records read, {} imported, {} rejected ({:.0f} rows/s)'.format(
+            done, imported, rejected, imported / max(time.time() - started, 1e-6)))
+
+    name_indexes.pop(model, None)
+    checkpoint.clear()
+    print('Imported {} {} in {:.1f}s.'.format(imported, kind, time.time() - started))
+
+#----------------------------------------------------------------------------#
+# Show pages.
+#----------------------------------------------------------------------------#
+
+SHOWS_PER_PAGE = 12
+ITEMS_PER_PAGE = 30
+
+def keyset_page(query, columns, after=None, before=None, per_page=ITEMS_PER_PAGE):
+    '''
+    Seek pagination over a unique, ascending key made of columns.
+    after / before are key values (tuples) taken from the last / first row of a neighbouring page.
+    Returns (rows, has_prev, has_next).
+    '''
+    key = db.tuple_(*columns)
+    if before is not None:
+        rows = query.filter(key < db.tuple_(*before)).order_by(
+            *[column.desc() for column in columns]
+        ).limit(per_page + 1).all()
+        return rows[:per_page][::-1], len(rows) > per_page, True
+
+    if after is not None:
+        query = query.filter(key > db.tuple_(*after))
+    rows = query.order_by(*columns).limit(per_page + 1).all()
+    return rows[:per_page], after is not None, len(rows) > per_page
+
+def encode_show_cursor(row):
+    return '{}_{}'.format(row.start_time.isoformat(), row.id)
+
+def decode_show_cursor(cursor):
+    try:
+        start_time, id = cursor.rsplit('_', 1)
+        # encode_show_cursor writes isoformat(), which fromisoformat reads back exactly.
+        return datetime.fromisoformat(start_time), int(id)
+    except ValueError:
+        abort(400)
+
+def shows_page(column, owner_id, upcoming, cursor=None, per_page=SHOWS_PER_PAGE):
+    '''
+    One page of a venue's or artist's shows with the other side's name and image joined in.
+    column is Show.venue_id or Show.artist_id. Upcoming shows run soonest first, past shows
+    latest first; cursor is the value returned for the previous page (keyset on start_time, id).
+    Returns (rows, cursor of the next page or None).
+    '''
+    now = datetime.now(timezone.utc)
+    query = db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Venue.image_link.label('venue_image_link'),
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link')
+        ).join(
+            Venue, Venue.id == Show.venue_id
+        ).join(
+            Artist, Artist.id == Show.artist_id
+        ).filter(column == owner_id)
+
+    key = db.tuple_(Show.start_time, Show.id)
+    if upcoming:
+        query = query.filter(Show.start_time > now).order_by(Show.start_time, Show.id)
+        if cursor:
+            query = query.filter(key > db.tuple_(*decode_show_cursor(cursor)))
+    else:
+        query = query.filter(Show.start_time <= now).order_by(Show.start_time.desc(), Show.id.desc())
+        if cursor:
+            query = query.filter(key < db.tuple_(*decode_show_cursor(cursor)))
+
+    rows = query.limit(per_page + 1).all()
+    if len(rows) > per_page:
+        return rows[:per_page], encode_show_cursor(rows[per_page - 1])
+    return rows, None
+
+def shows_counts(column, owner_id):
+    # (upcoming, past) from two index-only COUNTs instead of loading the shows.
+    now = datetime.now(timezone.utc)
+    query = db.session.query(db.func.count(Show.id)).filter(column == owner_id)
+    return (
+        query.filter(Show.start_time > now).scalar(),
+        query.filter(Show.start_time <= now).scalar()
+    )
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -113,27 +522,27 @@ def index():
 def venues():
     # TODO: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
+    # One pass over venues only: upcoming show counts are kept on the venue row.
+    rows = db.session.query(
+            Venue.id,
+            Venue.name,
+            Venue.city,
+            Venue.state,
+            Venue.upcoming_shows_count
+        ).order_by(
+            Venue.state, Venue.city, Venue.id
+        ).all()
+
     data = []
-    venues = Venue.query.all()
-    citystates = []
-
-    for venue in venues:
-        citystates.append((venue.city, venue.state))
-
-    areas_set = set(citystates)
-
-    for area in areas_set:
-        venue_list = []
-        for venue in Venue.query.filter_by(state=area[1]).filter_by(city=area[0]).all():
-            venue_list.append({
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": db.session.query(Show).filter_by(venue_id = venue.id).filter(Show.start_time > str(datetime.now())).count()
-            })
+    for (city, state), area_rows in groupby(rows, key=lambda row: (row.city, row.state)):
         data.append({
-            "city": area[0],
-            "state": area[1],
-            "venues": venue_list
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": row.id,
+                "name": row.name,
+                "num_upcoming_shows": row.upcoming_shows_count
+            } for row in area_rows]
         })
     return render_template('pages/venues.html', areas=data);
 # Done
@@ -144,20 +553,21 @@ def search_venues():
     # seach for Hop should return "The Musical Hop".
     # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
     name = request.form.get('search_term', '')
-    search = "%{}%".format(name) # % is substring on both sides.
-    results = Venue.query.filter(Venue.name.ilike(search)).all()
+    limit = request.values.get('limit', SEARCH_PAGE_SIZE, type=int)
+    offset = request.values.get('offset', 0, type=int)
+    total, results = search_by_name(Venue, name, limit, offset)
     data = []
 
     for result in results:
         venue = {
             "id": result.id,
             "name": result.name,
-            "num_upcoming_shows": db.session.query(Show).filter_by(venue_id = result.id).filter(Show.start_time > str(datetime.now())).count()
+            "num_upcoming_shows": result.upcoming_shows_count
         }
         data.append(venue)
 
     response={
-        "count": len(results),
+        "count": total,
         "data": data
     }
     return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
@@ -169,27 +579,14 @@ def show_venue(venue_id):
     # shows the venue page with the given venue_id
     # TODO: replace with real venue data from the venues table, using venue_id
     venue = Venue.query.get(venue_id)
-    shows = venue.shows
-    now = str(datetime.now())
-
-    past_shows = []
-    past_shows_count = 0
-    upcoming_shows = []
-    upcoming_shows_count = 0
-    if shows:
-        for show in shows:
-            showdata = {
-                "artist_id": show.artist_id,
-                "artist_name": show.artist_name,
-                "artist_image_link": show.artist_image_link,
-                "start_time": show.start_time
-            }
-            if show.start_time < now:
-                past_shows.append(showdata)
-                past_shows_count += 1
-            else:
-                upcoming_shows.append(showdata)
-                upcoming_shows_count += 1
+    if venue is None:
+        abort(404)
+
+    upcoming_after = request.args.get('upcoming_after')
+    past_before = request.args.get('past_before')
+    upcoming_shows, upcoming_next = shows_page(Show.venue_id, venue_id, True, upcoming_after)
+    past_shows, past_next = shows_page(Show.venue_id, venue_id, False, past_before)
+    upcoming_shows_count, past_shows_count = shows_counts(Show.venue_id, venue_id)
 
     data = {
         "id": venue.id,
@@ -207,7 +604,9 @@ def show_venue(venue_id):
         "past_shows": past_shows,
         "upcoming_shows": upcoming_shows,
         "past_shows_count": past_shows_count,
-        "upcoming_shows_count": upcoming_shows_count
+        "upcoming_shows_count": upcoming_shows_count,
+        "upcoming_shows_next": upcoming_next and url_for('show_venue', venue_id=venue_id, upcoming_after=upcoming_next, past_before=past_before),
+        "past_shows_next": past_next and url_for('show_venue', venue_id=venue_id, upcoming_after=upcoming_after, past_before=past_next)
     }
     return render_template('pages/show_venue.html', venue=data)
 # Done
@@ -295,9 +694,21 @@ def delete_venue(venue_id):
 @app.route('/artists')
 def artists():
     # TODO: replace with real data returned from querying the database
-    data = Artist.query.all()
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    query = Artist.query.options(load_only(Artist.id, Artist.name))
+    data, has_prev, has_next = keyset_page(
+        query, [Artist.id],
+        after=None if after is None else (after,),
+        before=None if before is None else (before,)
+    )
     # Done
-    return render_template('pages/artists.html', artists=data)
+    return render_template(
+        'pages/artists.html',
+        artists=data,
+        prev_url=has_prev and data and url_for('artists', before=data[0].id),
+        next_url=has_next and data and url_for('artists', after=data[-1].id)
+    )
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
@@ -305,20 +716,21 @@ def search_artists():
     # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
     # search for "band" should return "The Wild Sax Band".
     name = request.form.get('search_term', '')
-    search = "%{}%".format(name) # % is substring on both sides.
-    results = Artist.query.filter(Artist.name.ilike(search)).all()
+    limit = request.values.get('limit', SEARCH_PAGE_SIZE, type=int)
+    offset = request.values.get('offset', 0, type=int)
+    total, results = search_by_name(Artist, name, limit, offset)
     data = []
 
     for result in results:
         artist = {
             "id": result.id,
             "name": result.name,
-            "num_upcoming_shows": db.session.query(Show).filter_by(venue_id = result.id).filter(Show.start_time > str(datetime.now())).count()
+            "num_upcoming_shows": result.upcoming_shows_count
         }
         data.append(artist)
 
     response={
-        "count": len(results),
+        "count": total,
         "data": data
     }
     return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
@@ -331,28 +743,14 @@ def show_artist(artist_id):
     # TODO: replace with real venue data from the venues table, using venue_id
 
     artist = Artist.query.get(artist_id)
+    if artist is None:
+        abort(404)
 
-    shows = artist.shows
-    now = str(datetime.now())
-
-    past_shows = []
-    past_shows_count = 0
-    upcoming_shows = []
-    upcoming_shows_count = 0
-    if shows:
-        for show in shows:
-            showdata = {
-            "venue_id": show.venue_id,
-            "venue_name": show.venue_name,
-            "venue_image_link": show.venue_image_link,
-            "start_time": show.start_time
-            }
-            if show.start_time < now:
-                past_shows.append(showdata)
-                past_shows_count += 1
-            else:
-                upcoming_shows.append(showdata)
-                upcoming_shows_count += 1
+    upcoming_after = request.args.get('upcoming_after')
+    past_before = request.args.get('past_before')
+    upcoming_shows, upcoming_next = shows_page(Show.artist_id, artist_id, True, upcoming_after)
+    past_shows, past_next = shows_page(Show.artist_id, artist_id, False, past_before)
+    upcoming_shows_count, past_shows_count = shows_counts(Show.artist_id, artist_id)
 
     data = {
     "id": artist.id,
@@ -369,7 +767,9 @@ def show_artist(artist_id):
     "past_shows": past_shows,
     "upcoming_shows": upcoming_shows,
     "past_shows_count": past_shows_count,
-    "upcoming_shows_count": upcoming_shows_count
+    "upcoming_shows_count": upcoming_shows_count,
+    "upcoming_shows_next": upcoming_next and url_for('show_artist', artist_id=artist_id, upcoming_after=upcoming_next, past_before=past_before),
+    "past_shows_next": past_next and url_for('show_artist', artist_id=artist_id, upcoming_after=upcoming_after, past_before=past_next)
     }
     
     return render_template('pages/show_artist.html', artist=data)
@@ -547,9 +947,34 @@ def shows():
     # displays list of shows at /shows
     # TODO: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
-    data=Show.query.all()
+    after = request.args.get('after')
+    before = request.args.get('before')
+    # Names and images come from the artist and venue rows, joined in the same query.
+    query = db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+            Show.venue_id,
+            Venue.name.label('venue_name')
+        ).join(
+            Artist, Artist.id == Show.artist_id
+        ).join(
+            Venue, Venue.id == Show.venue_id
+        ).filter(Show.start_time.isnot(None))
+    data, has_prev, has_next = keyset_page(
+        query, [Show.start_time, Show.id],
+        after=decode_show_cursor(after) if after else None,
+        before=decode_show_cursor(before) if before else None
+    )
     # Done
-    return render_template('pages/shows.html', shows=data)
+    return render_template(
+        'pages/shows.html',
+        shows=data,
+        prev_url=has_prev and data and url_for('shows', before=encode_show_cursor(data[0])),
+        next_url=has_next and data and url_for('shows', after=encode_show_cursor(data[-1]))
+    )
 
 @app.route('/shows/create')
 def create_shows():
@@ -562,20 +987,11 @@ def create_show_submission():
     # called to create new shows in the db, upon submitting new show listing form
     # TODO: insert form data as a new Show record in the db, instead
     error = False
-    artist_id = request.form['artist_id']
-    artist = Artist.query.get(artist_id)
-    venue_id = request.form['venue_id']
-    venue = Venue.query.get(venue_id)
     try:
         fetchdata = {
-            "artist_id": artist_id,
-            "artist_name": artist.name,
-            "artist_image_link": artist.image_link,
-            "venue_id": venue_id,
-            "venue_name": venue.name,
-            "venue_image_link": venue.image_link,
-            "start_time": request.form['start_time'],
-
+            "artist_id": request.form['artist_id'],
+            "venue_id": request.form['venue_id'],
+            "start_time": dateutil.parser.parse(request.form['start_time']),
         }
         show = Show(**fetchdata)
         db.session.add(show)
@@ -0,0 +1,66 @@
+'''
+Microbenchmark of the datetime template filter over show start times.
+
+Formats the same rows with the filter as it was before memoization (dateutil parse,
+then babel.dates.format_datetime with the pattern re-parsed on every call) and with
+app.format_datetime, after checking that both give identical output. Two workloads:
+start times clustered on a few thousand slots (a real listing), and all distinct,
+so the result cache never hits. Pure Python, no database is opened.
+
+    python benchmark_filters.py --rows 100000 --format full
+'''
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import DATETIME_FORMATS, format_datetime
+
+
+def legacy_format_datetime(value, format='medium'):
+    if isinstance(value, datetime):
+        date = value
+    else:
+        date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, DATETIME_FORMATS.get(format, format))
+
+
+def start_times(rows, slots):
+    # ISO strings, as the templates receive them from the show views.
+    start = datetime(2030, 1, 1, 18, 0)
+    offsets = [random.randrange(slots) for _ in range(rows)] if slots else range(rows)
+    return [(start + timedelta(minutes=30 * offset)).isoformat() for offset in offsets]
+
+
+def timed(filter, values, format):
+    started = time.perf_counter()
+    for value in values:
+        filter(value, format)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--slots', type=int, default=5000, help='distinct start times of the clustered workload')
+    parser.add_argument('--format', default='full')
+    args = parser.parse_args()
+
+    print('{} rows, format {!r}'.format(args.rows, args.format))
+    for name, slots in (('clustered on {} slots'.format(args.slots), args.slots), ('all distinct', 0)):
+        values = start_times(args.rows, slots)
+        for value in values[:1000]:
+            assert format_datetime(value, args.format) == legacy_format_datetime(value, args.format), value
+        format_datetime.cache_clear()
+
+        before = timed(legacy_format_datetime, values, args.format)
+        after = timed(format_datetime, values, args.format)
+        format_datetime.cache_clear()
+        print('  {:<24} before {:7.2f} s   after {:7.2f} s   ({:.1f}x)'.format(name, before, after, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import csv
+import json
+import os
+from itertools import islice
+
+
+def iter_records(path):
+    '''
+    Streams dicts from a CSV file (header row required) or an NDJSON file (one object per line).
+    The format is picked from the file extension; lines are read one at a time.
+    A line that is not valid JSON is yielded as its raw text, so the caller can reject it and go on.
+    '''
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            for record in csv.DictReader(f):
+                yield record
+    else:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield line
+
+
+def chunked(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def as_list(value):
+    # CSV cells hold lists as "Jazz;Folk"; NDJSON already has real lists.
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).split(';') if item.strip()]
+
+
+def as_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 't', 'yes', 'y')
+
+
+class Checkpoint:
+    '''
+    Number of input records already committed for one import, kept in a small JSON file
+    so an interrupted import resumes after the last committed chunk.
+    '''
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.done = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get('source') == self.source:
+                self.done = state.get('done', 0)
+
+    def save(self, done):
+        self.done = done
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'source': self.source, 'done': done}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,38 @@
+"""Drop artist/venue name and image copies from shows.
+
+Revision ID: a47d3e6b90f2
+Revises: e82b7f0c4d19
+Create Date: 2026-10-18 12:48:51.301662
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a47d3e6b90f2'
+down_revision = 'e82b7f0c4d19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_column('shows', 'venue_image_link')
+    op.drop_column('shows', 'venue_name')
+    op.drop_column('shows', 'artist_image_link')
+    op.drop_column('shows', 'artist_name')
+
+
+def downgrade():
+    op.add_column('shows', sa.Column('artist_name', sa.VARCHAR(), autoincrement=False, nullable=True))
+    op.add_column('shows', sa.Column('artist_image_link', sa.VARCHAR(length=500), autoincrement=False, nullable=True))
+    op.add_column('shows', sa.Column('venue_name', sa.VARCHAR(), autoincrement=False, nullable=True))
+    op.add_column('shows', sa.Column('venue_image_link', sa.VARCHAR(length=500), autoincrement=False, nullable=True))
+    op.execute(
+        "UPDATE shows SET artist_name = artists.name, artist_image_link = artists.image_link "
+        "FROM artists WHERE artists.id = shows.artist_id"
+    )
+    op.execute(
+        "UPDATE shows SET venue_name = venues.name, venue_image_link = venues.image_link "
+        "FROM venues WHERE venues.id = shows.venue_id"
+    )
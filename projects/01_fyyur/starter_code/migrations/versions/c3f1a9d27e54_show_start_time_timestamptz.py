@@ -0,0 +1,39 @@
+"""Show start_time as timestamp with time zone, indexed per venue and artist.
+
+Revision ID: c3f1a9d27e54
+Revises: 94a51bc78454
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f1a9d27e54'
+down_revision = '94a51bc78454'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Blank strings cannot be cast, so they become NULL before the type change.
+    op.execute("UPDATE shows SET start_time = NULL WHERE trim(start_time) = ''")
+    # The USING clause backfills every existing row in the same statement.
+    op.alter_column('shows', 'start_time',
+               existing_type=sa.String(length=50),
+               type_=sa.DateTime(timezone=True),
+               existing_nullable=True,
+               postgresql_using='start_time::timestamp with time zone')
+    op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_shows_artist_id_start_time', table_name='shows')
+    op.drop_index('ix_shows_venue_id_start_time', table_name='shows')
+    op.alter_column('shows', 'start_time',
+               existing_type=sa.DateTime(timezone=True),
+               type_=sa.String(length=50),
+               existing_nullable=True,
+               postgresql_using='start_time::text')
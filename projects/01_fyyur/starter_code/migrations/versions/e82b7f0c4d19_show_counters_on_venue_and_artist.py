@@ -0,0 +1,45 @@
+"""Upcoming/past show counters on venues and artists.
+
+Revision ID: e82b7f0c4d19
+Revises: 5be0d6a41c83
+Create Date: 2026-10-18 11:26:05.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e82b7f0c4d19'
+down_revision = '5be0d6a41c83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('show_counter_rollovers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Backfill, and record the split instant so `flask rollover-shows` continues from here.
+    op.execute("INSERT INTO show_counter_rollovers (rolled_at) VALUES (now())")
+    for table, column in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.execute(
+            "UPDATE {table} SET "
+            "upcoming_shows_count = (SELECT count(*) FROM shows WHERE shows.{column} = {table}.id "
+            "AND shows.start_time > (SELECT rolled_at FROM show_counter_rollovers)), "
+            "past_shows_count = (SELECT count(*) FROM shows WHERE shows.{column} = {table}.id "
+            "AND shows.start_time <= (SELECT rolled_at FROM show_counter_rollovers))".format(table=table, column=column)
+        )
+
+
+def downgrade():
+    op.drop_table('show_counter_rollovers')
+    for table in ('artists', 'venues'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+# Default page size for venue and artist searches.
+SEARCH_PAGE_SIZE = 50
+
+
+def trigrams(text, padded=True):
+    # pg_trgm style: lowercase, words padded with two leading blanks and one trailing blank.
+    grams = set()
+    for word in text.lower().split():
+        if padded:
+            word = '  ' + word + ' '
+        for i in range(len(word) - 2):
+            grams.add(word[i:i + 3])
+    return grams
+
+
+def similarity(a, b):
+    # Same measure as pg_trgm similarity(): shared trigrams over all trigrams.
+    grams_a = trigrams(a)
+    grams_b = trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / float(len(grams_a | grams_b))
+
+
+class NgramIndex:
+    '''
+    In-process trigram index over (id, name) pairs.
+    Used instead of the pg_trgm GIN index when the database is not PostgreSQL (e.g. SQLite test runs).
+    Matches like ilike('%term%') and ranks like pg_trgm similarity().
+    '''
+    def __init__(self):
+        self.names = {}
+        self.postings = defaultdict(set)
+
+    def add(self, id, name):
+        self.remove(id)
+        name = name or ''
+        self.names[id] = name
+        for gram in self._substring_grams(name):
+            self.postings[gram].add(id)
+
+    def remove(self, id):
+        name = self.names.pop(id, None)
+        if name is None:
+            return
+        for gram in self._substring_grams(name):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self.postings[gram]
+
+    def search(self, term, limit=SEARCH_PAGE_SIZE, offset=0):
+        # Returns (total number of matches, ids of the requested page).
+        term = term.lower()
+        candidates = None
+        for gram in self._substring_grams(term):
+            ids = self.postings.get(gram, set())
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return 0, []
+        if candidates is None:
+            # Term shorter than a trigram: every name is a candidate.
+            candidates = self.names.keys()
+
+        matches = [id for id in candidates if term in self.names[id].lower()]
+        matches.sort(key=lambda id: (-similarity(term, self.names[id]), self.names[id].lower(), id))
+        return len(matches), matches[offset:offset + limit]
+
+    def _substring_grams(self, text):
+        # Unpadded trigrams of the whole string, so any substring's trigrams are a subset.
+        text = text.lower()
+        return set(text[i:i + 3] for i in range(len(text) - 2))
@@ -0,0 +1,191 @@
+import os
+import tempfile
+import unittest
+from urllib.parse import urlencode
+from datetime import datetime, timedelta, timezone
+import json
+
+import sqlalchemy
+from sqlalchemy import event
+
+'''
+The models target PostgreSQL; these tests run them on a throwaway SQLite file.
+ARRAY columns (genres) have no SQLite rendering, so they are stored as JSON here.
+The shim must be in place before app is imported, because the models are declared at import time.
+'''
+class SQLiteArray(sqlalchemy.types.TypeDecorator):
+    impl = sqlalchemy.JSON
+    cache_ok = True
+
+    def __init__(self, item_type=None, *args, **kwargs):
+        super().__init__()
+
+
+sqlalchemy.ARRAY = SQLiteArray
+
+from app import app, db, encode_show_cursor, name_indexes, Artist, Show, Venue, SEARCH_PAGE_SIZE  # noqa: E402 (must follow the ARRAY shim)
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the Fyyur test case"""
+
+    def setUp(self):
+        handle, self.database = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + self.database
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.context = app.app_context()
+        self.context.push()
+        db.create_all()
+        name_indexes.clear()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.get_engine().dispose()
+        self.context.pop()
+        name_indexes.clear()
+        os.remove(self.database)
+
+    def count_statements(self, call):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            call()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        return len(statements)
+
+    def test_search_statement_count_constant(self):
+        for i in range(500):
+            db.session.add(Artist(name='Band {}'.format(i), genres=['Jazz']))
+            db.session.add(Venue(name='Hall {}'.format(i), genres=['Jazz']))
+        db.session.commit()
+
+        for path, prefix in (('/artists/search', 'Band'), ('/venues/search', 'Hall')):
+            self.client.post(path, data={'search_term': prefix})  # builds the in-process name index
+            counts = []
+            for limit in (5, 50, 500):
+                res = self.count_statements(
+                    lambda: self.client.post(path + '?limit={}'.format(limit), data={'search_term': prefix}))
+                counts.append(res)
+
+            self.assertEqual(len(set(counts)), 1, '{}: {}'.format(path, counts))
+
+    def test_search_page_bounds_clamped(self):
+        for i in range(SEARCH_PAGE_SIZE + 5):
+            db.session.add(Artist(name='Band {}'.format(i), genres=['Jazz']))
+        db.session.commit()
+
+        for query, shown in (('limit=0', 1), ('limit=-5&offset=-10', 1), ('limit=100000', SEARCH_PAGE_SIZE)):
+            res = self.client.post('/artists/search?' + query, data={'search_term': 'Band'})
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.data.count(b'href="/artists/'), shown, query)
+
+    def test_import_rejects_bad_show_records(self):
+        db.session.add(Artist(id=2, name='Band', genres=['Jazz']))
+        db.session.add(Venue(id=2, name='Hall', genres=['Jazz']))
+        db.session.commit()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'shows.ndjson')
+        with open(path, 'w') as f:
+            f.write('{"artist_id": "", "venue_id": 2, "start_time": "2030-01-01 10:00"}\n')
+            f.write('{"venue_id": 2, "start_time": "2030-01-01 10:00"}\n')
+            f.write('{"artist_id": "x", "venue_id": 2, "start_time": "2030-01-01 10:00"}\n')
+            f.write('{"artist_id": 2, "venue_id": 2, "start_time": 1893492000}\n')
+            f.write('{"artist_id": 2, "venue_id": 2, "start_time": \n')
+            f.write('[1, 2]\n')
+            f.write('{"artist_id": "2", "venue_id": "2", "start_time": "2030-01-01 10:00"}\n')
+
+        result = app.test_cli_runner().invoke(args=['import', 'shows', path])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('6 rejected', result.output)
+        self.assertEqual(Show.query.count(), 1)
+
+    def test_import_records_with_different_optional_columns(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        venue = {'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St', 'genres': ['Jazz'],
+                 'facebook_link': 'https://www.facebook.com/hall'}
+        for i, order in enumerate(((True, False), (False, True))):
+            path = os.path.join(directory.name, 'venues{}.ndjson'.format(i))
+            with open(path, 'w') as f:
+                for j, with_image in enumerate(order):
+                    record = dict(venue, name='Hall {}-{}'.format(i, j))
+                    if with_image:
+                        record['image_link'] = 'https://example.com/{}-{}.jpg'.format(i, j)
+                    f.write(json.dumps(record) + '\n')
+
+            result = app.test_cli_runner().invoke(args=['import', 'venues', path])
+
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn('2 imported', result.output)
+            venues = Venue.query.filter(Venue.name.like('Hall {}-%'.format(i)))
+            images = dict((venue.name, venue.image_link) for venue in venues)
+            self.assertEqual(images, {
+                'Hall {}-0'.format(i): order[0] and 'https://example.com/{}-0.jpg'.format(i) or None,
+                'Hall {}-1'.format(i): order[1] and 'https://example.com/{}-1.jpg'.format(i) or None,
+            })
+            self.assertTrue(all(venue.seeking_talent is False for venue in Venue.query))
+
+    def test_show_cursors_round_trip(self):
+        db.session.add(Artist(id=1, name='Band', genres=['Jazz']))
+        db.session.add(Venue(id=1, name='Hall', genres=['Jazz']))
+        now = datetime.now(timezone.utc)
+        for days in range(-20, 20):
+            db.session.add(Show(artist_id=1, venue_id=1, start_time=now + timedelta(days=days, minutes=1)))
+        db.session.commit()
+        shows = Show.query.order_by(Show.start_time, Show.id).all()
+
+        res = self.client.get('/venues/1?' + urlencode({
+            'upcoming_after': encode_show_cursor(shows[25]),
+            'past_before': encode_show_cursor(shows[5])
+        }))
+        self.assertEqual(res.status_code, 200)
+        res = self.client.get('/artists/1?upcoming_after=not-a-cursor')
+        self.assertEqual(res.status_code, 400)
+
+    def test_moved_show_recounts_both_venues(self):
+        db.session.add(Artist(id=1, name='Band', genres=['Jazz']))
+        db.session.add(Venue(id=1, name='Hall', genres=['Jazz']))
+        db.session.add(Venue(id=2, name='Club', genres=['Jazz']))
+        show = Show(artist_id=1, venue_id=1, start_time=datetime.now(timezone.utc) + timedelta(days=1))
+        db.session.add(show)
+        db.session.commit()
+
+        for venue_id in (2, 1):
+            show.venue_id = venue_id  # the show is expired by the previous commit
+            db.session.commit()
+
+            counts = dict((venue.id, venue.upcoming_shows_count) for venue in Venue.query)
+            self.assertEqual(counts, {1: int(venue_id == 1), 2: int(venue_id == 2)})
+
+    def test_shows_empty_cursor(self):
+        res = self.client.get('/shows?after=&before=')
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_search_skips_rows_deleted_outside_the_orm(self):
+        for i in range(3):
+            db.session.add(Artist(id=i + 1, name='Band {}'.format(i), genres=['Jazz']))
+        db.session.commit()
+        self.client.post('/artists/search', data={'search_term': 'Band'})
+        with db.engine.begin() as connection:
+            connection.execute(sqlalchemy.text('DELETE FROM artists WHERE id = 3'))
+
+        res = self.client.post('/artists/search', data={'search_term': 'Band'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn(b'Band 2', res.data)
+        self.assertIn(b'Number of search results for "Band": 2', res.data)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+'''
+Load test and benchmark for the trivia API.
+
+Seeds synthetic question banks of the requested sizes into a fresh database
+(a temporary SQLite file by default, or --database-url, e.g. an ephemeral Postgres),
+then drives the main endpoints twice: in-process through the Flask test client,
+and over HTTP against a multi-threaded WSGI server. Latency percentiles,
+SQL statements per request and peak RSS are written to a JSON report so runs
+can be compared across commits. Each size runs in its own process, so its
+peak RSS is not inflated by the sizes before it.
+
+    python benchmark.py --sizes 10000 100000 1000000 --output benchmark.json
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from flaskr import create_app
+from models import db, Question, Category
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+WORDS = ['river', 'painter', 'planet', 'empire', 'film', 'goal', 'element', 'novel',
+         'mountain', 'battle', 'album', 'league', 'atom', 'sculpture', 'capital', 'dynasty']
+SEED_CHUNK_SIZE = 20000
+
+
+def seed(app, size):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(Category.__table__.insert(), [{'type': name} for name in CATEGORIES])
+        rows = []
+        for i in range(size):
+            words = random.sample(WORDS, 3)
+            rows.append({
+                'question': 'Which {} is linked to the {} and the {}? #{}'.format(words[0], words[1], words[2], i),
+                'answer': '{} {}'.format(random.choice(WORDS), i),
+                'category': i % len(CATEGORIES) + 1,
+                'difficulty': i % 5 + 1
+            })
+            if len(rows) == SEED_CHUNK_SIZE:
+                db.session.execute(Question.__table__.insert(), rows)
+                rows = []
+        if rows:
+            db.session.execute(Question.__table__.insert(), rows)
+        db.session.commit()
+
+
+def scenarios(size):
+    # name -> function returning (method, path, json body) for one request
+    pages = max(size // 10, 1)
+    return {
+        'questions': lambda: ('GET', '/questions?page={}'.format(random.randint(1, pages)), None),
+        'search': lambda: ('POST', '/questions/search', {'searchTerm': random.choice(WORDS)}),
+        'category': lambda: ('GET', '/categories/{}/questions?page={}'.format(
+            random.randint(1, len(CATEGORIES)), random.randint(1, max(pages // len(CATEGORIES), 1))), None),
+        'quiz': lambda: ('POST', '/quizzes', {
+            'previous_questions': random.sample(range(1, size + 1), min(20, size)),
+            'quiz_category': {'id': random.randint(0, len(CATEGORIES))}
+        }),
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarize(latencies):
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+    }
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        self.lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self.increment)
+
+    def increment(self, *args):
+        with self.lock:
+            self.count += 1
+
+
+def run_client(app, make_request, requests, counter):
+    client = app.test_client()
+    method, path, body = make_request()
+    client.open(path, method=method, json=body)  # warm-up (builds caches and in-process indexes)
+
+    latencies = []
+    counter.count = 0
+    for _ in range(requests):
+        method, path, body = make_request()
+        started = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code >= 500:
+            raise RuntimeError('{} {} returned {}'.format(method, path, response.status_code))
+    result = summarize(latencies)
+    result['statements_per_request'] = round(counter.count / float(requests), 2)
+    return result
+
+
+def run_server(base_url, make_request, requests, threads):
+    def send(_):
+        method, path, body = make_request()
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(send, range(requests)))
+    elapsed = time.perf_counter() - started
+    result = summarize(latencies)
+    result['requests_per_second'] = round(requests / elapsed, 1)
+    return result
+
+
+def benchmark_size(size, database_url, requests, threads):
+    app = create_app({'DATABASE_PATH': database_url, 'TESTING': True})
+    started = time.perf_counter()
+    seed(app, size)
+    report = {'size': size, 'seed_seconds': round(time.perf_counter() - started, 2), 'endpoints': {}}
+
+    with app.app_context():
+        counter = StatementCounter(db.engine)
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        base_url = 'http://127.0.0.1:{}'.format(server.server_port)
+        try:
+            for name, make_request in scenarios(size).items():
+                report['endpoints'][name] = {
+                    'client': run_client(app, make_request, requests, counter),
+                    'server': run_server(base_url, make_request, requests, threads),
+                }
+                print('{:>9} {:<9} {}'.format(size, name, json.dumps(report['endpoints'][name])), file=sys.stderr)
+        finally:
+            server.shutdown()
+
+    # ru_maxrss never goes down within a process, so each size runs in its own (see run_size).
+    # It is KiB on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report['peak_rss_mb'] = round(rss / (1024.0 * 1024 if sys.platform == 'darwin' else 1024.0), 1)
+    return report
+
+
+def run_size(*args):
+    # A fresh interpreter per size, so peak_rss_mb is that size's own peak rather than the largest so far.
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(benchmark_size, args)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint and mode')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent clients against the WSGI server')
+    parser.add_argument('--database-url', default=None,
+                        help='database to seed (tables are dropped); default: a temporary SQLite file per size')
+    parser.add_argument('--output', default='benchmark.json')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        if args.database_url:
+            results.append(run_size(size, args.database_url, args.requests, args.threads))
+            continue
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        try:
+            results.append(run_size(size, 'sqlite:///' + path, args.requests, args.threads))
+        finally:
+            os.remove(path)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'database': args.database_url.split(':')[0] if args.database_url else 'sqlite',
+        'requests': args.requests,
+        'threads': args.threads,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Report written to {}'.format(args.output), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
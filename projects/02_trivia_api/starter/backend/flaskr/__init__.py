@@ -1,27 +1,101 @@
 import os
-from flask import Flask, request, abort, jsonify
+import json
+from flask import Flask, request, abort, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 import random
 
-from models import setup_db, Question, Category
+from models import setup_db, database_path, db, Question, Category, category_cache, question_id_cache
+from .quiz_sessions import make_session_store
+from .search import search_questions, reset_index
+from .cli import questions_cli
 
 QUESTIONS_PER_PAGE = 10
-
-def paginate_questions(request, selection):
-    page = request.args.get('page', 1, type=int)
-    start =  (page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
-
-    questions = [question.format() for question in selection]
-    current_questions = questions[start:end]
-
-    return current_questions
+MAX_BATCH_SIZE = 100
+
+'''
+paginate_questions(request, query)
+    returns (formatted questions of the requested page, total number of questions in query)
+    LIMIT/OFFSET for ?page=<n>, or a keyset seek for ?after=<last question id>, run in SQL,
+    so only one page of rows is loaded and formatted; the total comes from a separate COUNT.
+'''
+def paginate_questions(request, query):
+    total = query.order_by(None).with_entities(db.func.count(Question.id)).scalar()
+
+    after = request.args.get('after', type=int)
+    if after is not None:
+        page_query = query.filter(Question.id > after).order_by(Question.id)
+    else:
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_query = query.order_by(Question.id).offset((page - 1) * QUESTIONS_PER_PAGE)
+
+    questions = [question.format() for question in page_query.limit(QUESTIONS_PER_PAGE).all()]
+
+    return questions, total
+
+'''
+wants_stream(request) / stream_questions(filters)
+    opt-in streaming for large result sets (?stream=1 or Accept: application/x-ndjson):
+    every matching question is written as one NDJSON line while rows are fetched
+    through a server-side cursor, so server memory stays constant.
+'''
+STREAM_CHUNK_SIZE = 1000
+
+def wants_stream(request):
+    if request.args.get('stream', type=int) == 1:
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+def stream_questions(*filters):
+    rows = db.session.query(
+        Question.id, Question.question, Question.answer, Question.category, Question.difficulty
+    ).filter(*filters).order_by(Question.id).execution_options(
+        stream_results=True
+    ).yield_per(STREAM_CHUNK_SIZE)
+
+    def generate():
+        for id, question, answer, category, difficulty in rows:
+            yield json.dumps({
+                'id': id,
+                'question': question,
+                'answer': answer,
+                'category': category,
+                'difficulty': difficulty
+            }) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+'''
+question_from_json(item)
+    builds an unsaved Question from a JSON object, raising ValueError if a field is missing or invalid
+'''
+def question_from_json(item):
+    if not isinstance(item, dict):
+        raise ValueError('question must be an object')
+    question = item.get('question') or ''
+    answer = item.get('answer') or ''
+    if not isinstance(question, str) or not isinstance(answer, str):
+        raise ValueError('question and answer must be text')
+    question, answer = question.strip(), answer.strip()
+    if not question or not answer:
+        raise ValueError('question and answer are required')
+    try:
+        category = int(item['category'])
+        difficulty = int(item['difficulty'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('category and difficulty must be integers')
+    return Question(question=question, answer=answer, category=category, difficulty=difficulty)
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__)
-    setup_db(app)
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+    setup_db(app, app.config.get('DATABASE_PATH', database_path))
+    quiz_sessions = make_session_store(app.config)
+    reset_index()
+    app.cli.add_command(questions_cli)
     '''
     @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
     '''
@@ -41,12 +115,18 @@ def create_app(test_config=None):
     '''
     @app.route('/categories')
     def retrieve_categoriess():
-        categories = {category.id: category.type for category in Category.query.all()}
+        categories = category_cache.get()
 
-        return jsonify({
+        response = jsonify({
             'success': True,
             'categories': categories
         })
+        # Clients revalidate with If-None-Match / If-Modified-Since and get a 304 while nothing changed.
+        response.set_etag(category_cache.etag)
+        response.last_modified = category_cache.last_modified
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
 
     '''
     @TODO: Done
@@ -62,11 +142,12 @@ def create_app(test_config=None):
     '''
     @app.route('/questions')
     def retrieve_questions():
+        if wants_stream(request):
+            return stream_questions()
+
         try:
-            selection = Question.query.order_by(Question.id).all()
-            num_questions = len(selection)
-            questions = paginate_questions(request, selection)
-            categories = {category.id: category.type for category in Category.query.all()}
+            questions, num_questions = paginate_questions(request, Question.query)
+            categories = category_cache.get()
             currentCategory = [question["category"] for question in questions]
 
             return jsonify({
@@ -96,10 +177,8 @@ def create_app(test_config=None):
 
         try:
             question.delete()
-            selection = Question.query.order_by(Question.id).all()
-            num_questions = len(selection)
-            questions = paginate_questions(request, selection)
-            categories = {category.id: category.type for category in Category.query.all()}
+            questions, num_questions = paginate_questions(request, Question.query)
+            categories = category_cache.get()
 
             return jsonify({
                 'question_id': question_id,
@@ -148,8 +227,8 @@ def create_app(test_config=None):
             question= Question(
                 question=new_question, 
                 answer=new_answer, 
-                category=new_category, 
-                difficulty=new_difficulty
+                category=int(new_category), 
+                difficulty=int(new_difficulty)
                 )
             question.insert()
 
@@ -161,6 +240,87 @@ def create_app(test_config=None):
             print(e)
             abort(422)
     '''
+    Batch endpoints for editorial tools: up to MAX_BATCH_SIZE operations in one request
+    and one transaction, answered with a status per item instead of the question list.
+    POST /questions/batch    {"questions": [{question, answer, category, difficulty}, ...]}
+    DELETE /questions/batch  {"ids": [question id, ...]}
+    '''
+    def batch_items(key):
+        body = request.get_json(silent=True) or {}
+        items = body.get(key)
+        if not isinstance(items, list) or not items or len(items) > MAX_BATCH_SIZE:
+            abort(400)
+        return items
+
+    @app.route('/questions/batch', methods=['POST'])
+    def create_questions_batch():
+        items = batch_items('questions')
+        results = []
+        created = []
+        for index, item in enumerate(items):
+            try:
+                question = question_from_json(item)
+            except ValueError as e:
+                results.append({'index': index, 'status': 400, 'message': str(e)})
+                continue
+            created.append((index, question))
+            results.append(None)
+
+        # category is a foreign key: check every id with one IN query, so one unknown
+        # category fails its own item instead of the whole commit.
+        wanted = set(question.category for index, question in created)
+        known = set(id for id, in db.session.query(Category.id).filter(Category.id.in_(wanted))) if wanted else set()
+        for index, question in created:
+            if question.category not in known:
+                results[index] = {'index': index, 'status': 400, 'message': 'unknown category'}
+        created = [(index, question) for index, question in created if question.category in known]
+
+        try:
+            db.session.add_all([question for index, question in created])
+            db.session.commit()
+        except Exception as e: 
+            db.session.rollback()
+            print(e)
+            abort(422)
+
+        for index, question in created:
+            results[index] = {'index': index, 'status': 201, 'id': question.id}
+
+        return jsonify({
+            'success': True,
+            'created': len(created),
+            'results': results
+        })
+
+    @app.route('/questions/batch', methods=['DELETE'])
+    def delete_questions_batch():
+        items = batch_items('ids')
+        try:
+            ids = [int(question_id) for question_id in items]
+        except (TypeError, ValueError):
+            abort(400)
+
+        try:
+            found = Question.query.filter(Question.id.in_(set(ids))).all()
+            for question in found:
+                db.session.delete(question)
+            db.session.commit()
+        except Exception as e: 
+            db.session.rollback()
+            print(e)
+            abort(422)
+
+        deleted = set(question.id for question in found)
+        return jsonify({
+            'success': True,
+            'deleted': len(deleted),
+            'results': [
+                {'id': question_id, 'status': 200 if question_id in deleted else 404}
+                for question_id in ids
+            ]
+        })
+
+    '''
     @TODO: Done
     Create a POST endpoint to get questions based on a search term. 
     It should return any questions for whom the search term 
@@ -175,11 +335,13 @@ def create_app(test_config=None):
         try:
             body = request.get_json()
             search_term = body.get('searchTerm')
-            search = "%{}%".format(search_term)
-            results = Question.query.filter(Question.question.ilike(search)).all()
-
-            num_questions = len(results)
-            questions = paginate_questions(request, results)
+            category = body.get('category')
+            questions, num_questions = search_questions(
+                search_term,
+                None if category in (None, '', 0) else int(category),
+                request.args.get('page', 1, type=int),
+                QUESTIONS_PER_PAGE
+            )
             currentCategory = [question["category"] for question in questions]
 
             return jsonify({
@@ -201,13 +363,15 @@ def create_app(test_config=None):
     '''
     @app.route('/categories/<int:category_id>/questions', methods=['GET'])
     def get_by_category(category_id):
+        if wants_stream(request):
+            return stream_questions(Question.category == category_id)
+
         try:
-            results = Question.query.filter(Question.category == category_id).all()
+            results = Question.query.filter(Question.category == category_id)
             category = Category.query.get(category_id)
             currentCategory = category.type
 
-            num_questions = len(results)
-            questions = paginate_questions(request, results)
+            questions, num_questions = paginate_questions(request, results)
 
             return jsonify({
                 'questions': questions,
@@ -236,24 +400,20 @@ def create_app(test_config=None):
             body = request.get_json()
             previous_questions = body.get('previous_questions')  # ID sequence
             quiz_category = body.get('quiz_category')  # a dict containing ID
-            category_id = quiz_category["id"]
-
-            if category_id == 0:
-                questions = Question.query.all()
-            else:
-                questions = Question.query.filter(
-                            Question.category == category_id
-                            ).all()
-
-            question_pool = [question.id for question in questions]
-            question_id = random.choice(question_pool)
+            category_id = int(quiz_category["id"])
+            excluded = set(int(question_id) for question_id in previous_questions)
 
-            # While loop checks if random question is not repeated.
-            if len(question_pool) > len(previous_questions):
-                while question_id in previous_questions:
-                    question_id = random.choice(question_pool)
+            pool = Question.query
+            if category_id != 0:
+                pool = pool.filter(Question.category == category_id)
+            if excluded:
+                pool = pool.filter(~Question.id.in_(excluded))
 
-                question = Question.query.get(question_id)
+            # Count the unplayed questions and jump to a random one of them:
+            # two bounded queries, no retry loop however much of the pool has been played.
+            remaining = pool.order_by(None).with_entities(db.func.count(Question.id)).scalar()
+            if remaining:
+                question = pool.order_by(Question.id).offset(random.randrange(remaining)).first()
 
                 return jsonify({
                     'success': True,
@@ -269,6 +429,52 @@ def create_app(test_config=None):
             print(e)
             abort(422)
     '''
+    Quiz sessions: the server keeps a shuffled deck of question ids per game,
+    so the client does not resend previous_questions on every turn.
+    POST /quizzes/sessions with {"quiz_category": {"id": <id, 0 for all>}} starts a game,
+    then each POST /quizzes/sessions/<session_id>/next returns the next question.
+    '''
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def create_quiz_session():
+        try:
+            body = request.get_json()
+            category_id = int(body.get('quiz_category')["id"])
+
+            question_ids = question_id_cache.get(category_id)
+            session_id = quiz_sessions.create(question_ids)
+
+            return jsonify({
+                'success': True,
+                'session_id': session_id,
+                'total_questions': len(question_ids)
+            })
+
+        except Exception as e: 
+            print(e)
+            abort(422)
+
+    @app.route('/quizzes/sessions/<session_id>/next', methods=['POST'])
+    def next_quiz_question(session_id):
+        try:
+            while True:
+                question_id = quiz_sessions.next(session_id)
+                if question_id is None:
+                    return jsonify({
+                        'success': False,
+                        'message': "Out of questions"
+                    })
+                # Skip questions deleted since the deck was dealt.
+                question = Question.query.get(question_id)
+                if question is not None:
+                    return jsonify({
+                        'success': True,
+                        'question': question.format()
+                    })
+
+        except KeyError:
+            abort(404)
+
+    '''
     @TODO: Done
     Create error handlers for all expected errors 
     including 404 and 422. 
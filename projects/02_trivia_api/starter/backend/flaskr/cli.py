@@ -0,0 +1,167 @@
+import csv
+import hashlib
+import json
+import re
+import sys
+import time
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+
+from models import db, Question, Category, question_id_cache
+from .search import reset_index
+
+'''
+flask questions import PATH / flask questions export PATH
+    move question banks between environments as NDJSON (one object per line) or CSV,
+    picked from the file extension unless --format is given; PATH '-' means stdin/stdout.
+    Both directions stream in chunks, so memory stays flat whatever the size of the bank.
+'''
+questions_cli = AppGroup('questions', help='Bulk import and export of trivia questions.')
+
+FIELDS = ['id', 'question', 'answer', 'category', 'difficulty']
+
+
+def file_format(path, format):
+    if format:
+        return format
+    return 'csv' if path.endswith('.csv') else 'ndjson'
+
+
+def normalized_key(text):
+    # Questions that differ only in case, spacing or punctuation are duplicates.
+    normalized = ' '.join(re.findall(r'\w+', (text or '').lower()))
+    return hashlib.blake2b(normalized.encode(), digest_size=8).digest()
+
+
+def read_records(stream, format):
+    if format == 'csv':
+        for record in csv.DictReader(stream):
+            yield record
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield line  # rejected by as_row, so one bad line doesn't stop the import
+
+
+def as_row(record):
+    if not isinstance(record, dict):
+        raise ValueError('not a JSON object')
+    question = record.get('question') or ''
+    answer = record.get('answer') or ''
+    if not isinstance(question, str) or not isinstance(answer, str):
+        raise ValueError('question and answer must be text')
+    question, answer = question.strip(), answer.strip()
+    if not question or not answer:
+        raise ValueError('question and answer are required')
+    return {
+        'question': question,
+        'answer': answer,
+        'category': int(record['category']),
+        'difficulty': int(record['difficulty'])
+    }
+
+
+@questions_cli.command('import')
+@click.argument('path')
+@click.option('--format', type=click.Choice(['ndjson', 'csv']), default=None)
+@click.option('--chunk-size', default=5000, show_default=True, help='Questions inserted per transaction.')
+def import_questions(path, format, chunk_size):
+    """Insert questions from an NDJSON or CSV file, skipping duplicates."""
+    format = file_format(path, format)
+    started = time.time()
+
+    # Keys of every question already stored, streamed rather than loaded as rows.
+    seen = set()
+    existing = db.session.query(Question.question).execution_options(stream_results=True).yield_per(chunk_size)
+    for question, in existing:
+        seen.add(normalized_key(question))
+
+    read = inserted = duplicates = invalid = 0
+    stream = sys.stdin if path == '-' else open(path, newline='')
+    try:
+        records = read_records(stream, format)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            candidates = []
+            for record in chunk:
+                read += 1
+                try:
+                    candidates.append((read, as_row(record)))
+                except (KeyError, TypeError, ValueError) as e:
+                    invalid += 1
+                    click.echo('record {}: {}'.format(read, e), err=True)
+
+            # category is a foreign key: resolve the chunk's ids with one IN query
+            # rather than letting a single unknown one fail the whole insert.
+            wanted = set(row['category'] for number, row in candidates)
+            known = set(id for id, in db.session.query(Category.id).filter(Category.id.in_(wanted))) if wanted else set()
+
+            rows = []
+            for number, row in candidates:
+                if row['category'] not in known:
+                    invalid += 1
+                    click.echo('record {}: unknown category {}'.format(number, row['category']), err=True)
+                    continue
+                key = normalized_key(row['question'])
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                rows.append(row)
+
+            if rows:
+                db.session.execute(Question.__table__.insert(), rows)
+                db.session.commit()
+                inserted += len(rows)
+            click.echo('{} read, {} inserted, {} duplicates, {} invalid ({:.0f} questions/s)'.format(
+                read, inserted, duplicates, invalid, read / max(time.time() - started, 1e-6)), err=True)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    # Bulk inserts bypass the ORM events that keep the in-process search index and quiz decks current.
+    reset_index()
+    question_id_cache.invalidate()
+    click.echo('Imported {} questions in {:.1f}s.'.format(inserted, time.time() - started), err=True)
+
+
+@questions_cli.command('export')
+@click.argument('path')
+@click.option('--format', type=click.Choice(['ndjson', 'csv']), default=None)
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows fetched per round trip.')
+def export_questions(path, format, chunk_size):
+    """Write every question to an NDJSON or CSV file, streaming from a server-side cursor."""
+    format = file_format(path, format)
+    started = time.time()
+    rows = db.session.query(
+        Question.id, Question.question, Question.answer, Question.category, Question.difficulty
+    ).order_by(Question.id).execution_options(stream_results=True).yield_per(chunk_size)
+
+    stream = sys.stdout if path == '-' else open(path, 'w', newline='')
+    written = 0
+    try:
+        if format == 'csv':
+            writer = csv.writer(stream)
+            writer.writerow(FIELDS)
+            for row in rows:
+                writer.writerow(row)
+                written += 1
+        else:
+            for row in rows:
+                stream.write(json.dumps(dict(zip(FIELDS, row))) + '\n')
+                written += 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    elapsed = time.time() - started
+    click.echo('Exported {} questions in {:.1f}s ({:.0f} questions/s).'.format(
+        written, elapsed, written / max(elapsed, 1e-6)), err=True)
@@ -0,0 +1,147 @@
+import random
+from array import array
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+'''
+Quiz session stores
+    a quiz session is a shuffled deck of question ids kept on the server,
+    so /quizzes/sessions/<id>/next pops the next id in O(1) instead of the client
+    resending every previous question. Sessions expire after ttl seconds without use,
+    and at most max_sessions are kept: starting one more drops the least recently used.
+
+    create(question_ids) -> session id
+    next(session_id) -> next question id, or None when the deck is exhausted
+        raises KeyError for an unknown or expired session
+'''
+
+
+class MemorySessionStore:
+    def __init__(self, ttl=3600, max_sessions=10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.lock = threading.Lock()
+        # session id -> [deck, expires at]; kept in expiry order because every access moves it to the end.
+        # Decks are array('l'), 8 bytes per question id rather than a list of int objects.
+        self.sessions = OrderedDict()
+
+    def create(self, question_ids):
+        deck = array('l', question_ids)
+        random.shuffle(deck)
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            self._evict(time.time())
+            while len(self.sessions) >= self.max_sessions:
+                self.sessions.popitem(last=False)
+            self.sessions[session_id] = [deck, time.time() + self.ttl]
+        return session_id
+
+    def next(self, session_id):
+        now = time.time()
+        with self.lock:
+            self._evict(now)
+            session = self.sessions[session_id]
+            session[1] = now + self.ttl
+            self.sessions.move_to_end(session_id)
+            deck = session[0]
+            return deck.pop() if deck else None
+
+    def _evict(self, now):
+        while self.sessions:
+            session_id, (deck, expires) = next(iter(self.sessions.items()))
+            if expires > now:
+                return
+            del self.sessions[session_id]
+
+
+class SQLiteSessionStore:
+    # Several workers share one file: transactions take the write lock up front (BEGIN IMMEDIATE)
+    # so two readers never deadlock upgrading, and a busy worker waits up to `timeout` seconds.
+    def __init__(self, path, ttl=3600, timeout=30, max_sessions=10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS quiz_sessions (
+                id TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_quiz_sessions_expires ON quiz_sessions (expires);
+            CREATE TABLE IF NOT EXISTS quiz_session_questions (
+                session_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                question_id INTEGER NOT NULL,
+                PRIMARY KEY (session_id, position)
+            ) WITHOUT ROWID;
+        ''')
+
+    def create(self, question_ids):
+        deck = list(question_ids)
+        random.shuffle(deck)
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self._evict(now)
+            self._evict_oldest(self.max_sessions - 1)
+            self.connection.execute(
+                'INSERT INTO quiz_sessions (id, position, size, expires) VALUES (?, 0, ?, ?)',
+                (session_id, len(deck), now + self.ttl))
+            self.connection.executemany(
+                'INSERT INTO quiz_session_questions (session_id, position, question_id) VALUES (?, ?, ?)',
+                ((session_id, position, question_id) for position, question_id in enumerate(deck)))
+        return session_id
+
+    def next(self, session_id):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            row = self.connection.execute(
+                'SELECT position, size FROM quiz_sessions WHERE id = ? AND expires > ?',
+                (session_id, now)).fetchone()
+            if row is None:
+                raise KeyError(session_id)
+            position, size = row
+            self.connection.execute(
+                'UPDATE quiz_sessions SET position = ?, expires = ? WHERE id = ?',
+                (min(position + 1, size), now + self.ttl, session_id))
+            if position >= size:
+                return None
+            return self.connection.execute(
+                'SELECT question_id FROM quiz_session_questions WHERE session_id = ? AND position = ?',
+                (session_id, position)).fetchone()[0]
+
+    def _evict(self, now):
+        expired = 'SELECT id FROM quiz_sessions WHERE expires <= ?'
+        self.connection.execute(
+            'DELETE FROM quiz_session_questions WHERE session_id IN ({})'.format(expired), (now,))
+        self.connection.execute('DELETE FROM quiz_sessions WHERE expires <= ?', (now,))
+
+    def _evict_oldest(self, keep):
+        # expires moves forward on every use, so the earliest expiries are the least recently used sessions.
+        oldest = 'SELECT id FROM quiz_sessions ORDER BY expires DESC LIMIT -1 OFFSET ?'
+        self.connection.execute(
+            'DELETE FROM quiz_session_questions WHERE session_id IN ({})'.format(oldest), (max(keep, 0),))
+        self.connection.execute('DELETE FROM quiz_sessions WHERE id IN ({})'.format(oldest), (max(keep, 0),))
+
+
+'''
+make_session_store(config)
+    QUIZ_SESSION_BACKEND: 'memory' (default, per process) or 'sqlite' (shared by workers on one host)
+    QUIZ_SESSION_DB: SQLite file for the sqlite backend
+    QUIZ_SESSION_TTL: seconds a session lives without being used (default 3600)
+    QUIZ_SESSION_MAX: live sessions kept before the least recently used is dropped (default 10000)
+'''
+def make_session_store(config):
+    ttl = config.get('QUIZ_SESSION_TTL', 3600)
+    max_sessions = config.get('QUIZ_SESSION_MAX', 10000)
+    if config.get('QUIZ_SESSION_BACKEND', 'memory') == 'sqlite':
+        return SQLiteSessionStore(config.get('QUIZ_SESSION_DB', 'quiz_sessions.db'), ttl, max_sessions=max_sessions)
+    return MemorySessionStore(ttl, max_sessions)
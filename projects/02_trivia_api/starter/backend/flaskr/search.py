@@ -0,0 +1,158 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy import event, func
+
+from models import db, Question
+
+'''
+Question search
+    ranked full-text search over question and answer text, with an optional category filter.
+    PostgreSQL: a GIN index on SEARCH_DOCUMENT (see trivia.psql and models.py) answers
+    the @@ match, ranked with ts_rank. Every word of the term is a prefix, so partial words match.
+    Other databases (the SQLite test configuration): an in-process InvertedIndex with the same
+    matching rules, built on first use and kept current by Question mapper events.
+'''
+
+# 'simple' keeps every word (no stop words, no stemming), so searching "What" still works.
+SEARCH_CONFIG = 'simple'
+SEARCH_DOCUMENT = func.to_tsvector(
+    SEARCH_CONFIG,
+    func.coalesce(Question.question, '') + ' ' + func.coalesce(Question.answer, '')
+)
+
+
+def tokenize(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+class InvertedIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = defaultdict(dict)  # token -> {question id: occurrences}
+        self.documents = {}  # question id -> (tokens, category)
+        self.vocabulary = []  # sorted tokens, rebuilt lazily for prefix lookups
+        self.vocabulary_stale = False
+
+    def add(self, question_id, text, category):
+        with self.lock:
+            self._remove(question_id)
+            tokens = tokenize(text)
+            self.documents[question_id] = (tokens, str(category))
+            for token in tokens:
+                counts = self.postings[token]
+                if not counts:
+                    self.vocabulary_stale = True
+                counts[question_id] = counts.get(question_id, 0) + 1
+
+    def remove(self, question_id):
+        with self.lock:
+            self._remove(question_id)
+
+    def search(self, words, category=None):
+        # Returns matching question ids, best first: every word must prefix some token of the document.
+        with self.lock:
+            if self.vocabulary_stale:
+                self.vocabulary = sorted(self.postings)
+                self.vocabulary_stale = False
+
+            scores = None
+            for word in words:
+                matches = defaultdict(int)
+                start = bisect_left(self.vocabulary, word)
+                for token in self.vocabulary[start:]:
+                    if not token.startswith(word):
+                        break
+                    for question_id, count in self.postings.get(token, {}).items():
+                        matches[question_id] += count
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = dict((question_id, score + matches[question_id])
+                                  for question_id, score in scores.items() if question_id in matches)
+                if not scores:
+                    return []
+
+            if scores is None:
+                scores = dict.fromkeys(self.documents, 0)
+            if category is not None:
+                category = str(category)
+                scores = dict((question_id, score) for question_id, score in scores.items()
+                              if self.documents[question_id][1] == category)
+            return sorted(scores, key=lambda question_id: (-scores[question_id], question_id))
+
+    def _remove(self, question_id):
+        document = self.documents.pop(question_id, None)
+        if document is None:
+            return
+        for token in set(document[0]):
+            counts = self.postings.get(token)
+            if counts is not None:
+                counts.pop(question_id, None)
+                if not counts:
+                    del self.postings[token]
+                    self.vocabulary_stale = True
+
+
+index = None
+index_lock = threading.Lock()
+
+
+def get_index():
+    global index
+    with index_lock:
+        if index is None:
+            built = InvertedIndex()
+            for question_id, question, answer, category in db.session.query(
+                    Question.id, Question.question, Question.answer, Question.category):
+                built.add(question_id, '{} {}'.format(question or '', answer or ''), category)
+            index = built
+        return index
+
+
+def reset_index():
+    global index
+    with index_lock:
+        index = None
+
+
+@event.listens_for(Question, 'after_insert')
+@event.listens_for(Question, 'after_update')
+def index_question(mapper, connection, target):
+    if index is not None:
+        index.add(target.id, '{} {}'.format(target.question or '', target.answer or ''), target.category)
+
+
+@event.listens_for(Question, 'after_delete')
+def unindex_question(mapper, connection, target):
+    if index is not None:
+        index.remove(target.id)
+
+
+'''
+search_questions(term, category=None, page=1, per_page=10)
+    returns (formatted questions of the page, total number of matches)
+'''
+def search_questions(term, category=None, page=1, per_page=10):
+    words = tokenize(term)
+    start = (max(page, 1) - 1) * per_page
+
+    if db.engine.dialect.name == 'postgresql':
+        query = Question.query
+        if category is not None:
+            query = query.filter(Question.category == category)
+        order = [Question.id]
+        if words:
+            tsquery = func.to_tsquery(SEARCH_CONFIG, ' & '.join(word + ':*' for word in words))
+            query = query.filter(SEARCH_DOCUMENT.op('@@')(tsquery))
+            order.insert(0, func.ts_rank(SEARCH_DOCUMENT, tsquery).desc())
+        total = query.order_by(None).with_entities(func.count(Question.id)).scalar()
+        questions = query.order_by(*order).offset(start).limit(per_page).all()
+        return [question.format() for question in questions], total
+
+    matches = get_index().search(words, category)
+    ids = matches[start:start + per_page]
+    rows = {question.id: question for question in Question.query.filter(Question.id.in_(ids))} if ids else {}
+    return [rows[question_id].format() for question_id in ids if question_id in rows], len(matches)
@@ -1,5 +1,10 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import hashlib
+from array import array
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Integer, ForeignKey, create_engine, event, DDL
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -18,6 +23,7 @@ def setup_db(app, database_path=database_path):
     db.app = app
     db.init_app(app)
     db.create_all()
+    category_cache.invalidate()
 
 '''
 Question
@@ -29,8 +35,8 @@ class Question(db.Model):
   id = Column(Integer, primary_key=True)
   question = Column(String)
   answer = Column(String)
-  category = Column(String)
-  difficulty = Column(Integer)
+  category = Column(Integer, ForeignKey('categories.id', onupdate='CASCADE', ondelete='SET NULL'), index=True)
+  difficulty = Column(Integer, index=True)
 
   def __init__(self, question, answer, category, difficulty):
     self.question = question
@@ -58,6 +64,12 @@ class Question(db.Model):
       'difficulty': self.difficulty
     }
 
+# Full-text search index over question and answer (see flaskr/search.py); PostgreSQL only.
+event.listen(Question.__table__, 'after_create', DDL(
+  "CREATE INDEX IF NOT EXISTS ix_questions_search ON questions USING gin "
+  "(to_tsvector('simple', coalesce(question, '') || ' ' || coalesce(answer, '')))"
+).execute_if(dialect='postgresql'))
+
 '''
 Category
 
@@ -75,4 +87,79 @@ class Category(db.Model):
     return {
       'id': self.id,
       'type': self.type
-    }
\ No newline at end of file
+    }
+
+'''
+CategoryCache
+    process-level {id: type} map of all categories, shared by every endpoint.
+    Category writes through the ORM invalidate it; the ttl bounds staleness
+    for writes made by other processes or outside the ORM.
+    etag and last_modified describe the cached map for conditional GETs.
+'''
+class CategoryCache:
+  def __init__(self, ttl=300):
+    self.ttl = ttl
+    self.lock = threading.Lock()
+    self.categories = None
+    self.loaded_at = 0
+    self.etag = None
+    self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+
+  def get(self):
+    with self.lock:
+      if self.categories is None or time.time() - self.loaded_at > self.ttl:
+        self.load()
+      return self.categories
+
+  def load(self):
+    categories = {category.id: category.type for category in Category.query.order_by(Category.id)}
+    etag = hashlib.sha1(json.dumps(sorted(categories.items())).encode()).hexdigest()
+    if etag != self.etag:
+      self.etag = etag
+      self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+    self.categories = categories
+    self.loaded_at = time.time()
+
+  def invalidate(self, *args):
+    with self.lock:
+      self.categories = None
+
+category_cache = CategoryCache()
+
+for event_name in ('after_insert', 'after_update', 'after_delete'):
+  event.listen(Category, event_name, category_cache.invalidate)
+
+'''
+QuestionIdCache
+    process-level {category id: question ids} map for dealing quiz decks (0 holds every id),
+    so starting a game does not reread the category. Ids are kept as array('l'), 8 bytes each.
+    Question writes through the ORM invalidate it; the ttl bounds staleness
+    for writes made by other processes or outside the ORM.
+'''
+class QuestionIdCache:
+  def __init__(self, ttl=300):
+    self.ttl = ttl
+    self.lock = threading.Lock()
+    self.question_ids = {}
+    self.loaded_at = 0
+
+  def get(self, category_id):
+    with self.lock:
+      if time.time() - self.loaded_at > self.ttl:
+        self.question_ids = {}
+        self.loaded_at = time.time()
+      if category_id not in self.question_ids:
+        query = db.session.query(Question.id).order_by(Question.id)
+        if category_id != 0:
+          query = query.filter(Question.category == category_id)
+        self.question_ids[category_id] = array('l', (question_id for question_id, in query))
+      return self.question_ids[category_id]
+
+  def invalidate(self, *args):
+    with self.lock:
+      self.question_ids = {}
+
+question_id_cache = QuestionIdCache()
+
+for event_name in ('after_insert', 'after_update', 'after_delete'):
+  event.listen(Question, event_name, question_id_cache.invalidate)
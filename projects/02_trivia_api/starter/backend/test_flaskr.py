@@ -1,9 +1,12 @@
 import os
+import tempfile
+import threading
 import unittest
 import json
 from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
+from flaskr.quiz_sessions import MemorySessionStore, SQLiteSessionStore
 from models import setup_db, Question, Category
 
 
@@ -37,6 +40,13 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(data['categories'])
 
+    def test_get_categories_not_modified(self):
+        res = self.client().get('/categories')
+        etag = res.headers['ETag']
+
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+
     def test_retrieve_question(self):
         res = self.client().get('/questions')
         data = json.loads(res.data)
@@ -45,6 +55,33 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['questions'])
         self.assertTrue(len(data['questions']))
 
+    def test_retrieve_question_page_clamped(self):
+        first = json.loads(self.client().get('/questions').data)['questions']
+        for page in (0, -3):
+            res = self.client().get('/questions?page={}'.format(page))
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(data['questions'], first)
+
+    def test_retrieve_question_after(self):
+        res = self.client().get('/questions?after=5')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(len(data['questions']) <= 10)
+        self.assertTrue(all(question['id'] > 5 for question in data['questions']))
+        self.assertTrue(data['total_questions'])
+
+    def test_stream_questions(self):
+        res = self.client().get('/questions?stream=1')
+        lines = [json.loads(line) for line in res.data.decode().splitlines()]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertTrue(len(lines))
+        self.assertTrue(all('question' in line for line in lines))
+
     def test_delete_question(self):
         res = self.client().delete('/questions/1')
         data = json.loads(res.data)
@@ -85,6 +122,36 @@ class TriviaTestCase(unittest.TestCase):
         )
         self.assertEqual(res.status_code, 400)
 
+    def test_batch_questions(self):
+        res = self.client().post(
+            '/questions/batch',
+            json = {
+                "questions": [
+                    {"question": "Batch question?", "answer": "Yes", "difficulty": 1, "category": 1},
+                    {"question": "", "answer": "", "difficulty": 1, "category": 1},
+                    {"question": 5, "answer": "Five", "difficulty": 1, "category": 1},
+                    {"question": "Unknown category?", "answer": "Yes", "difficulty": 1, "category": 99999}
+                ]
+            }
+        )
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['created'], 1)
+        self.assertEqual([item['status'] for item in data['results']], [201, 400, 400, 400])
+
+        res = self.client().delete(
+            '/questions/batch',
+            json = {"ids": [data['results'][0]['id'], 100000]}
+        )
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['deleted'], 1)
+        self.assertEqual([item['status'] for item in data['results']], [200, 404])
+
+    def test_badrequest_batch_questions(self):
+        res = self.client().post('/questions/batch', json = {"questions": []})
+        self.assertEqual(res.status_code, 400)
+
     def test_search(self):
         res = self.client().post(
             'questions/search',
@@ -96,6 +163,18 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertTrue(data['questions'])
 
+    def test_search_category(self):
+        res = self.client().post(
+            'questions/search',
+            json = {
+                "searchTerm": "title",
+                "category": 4
+            }
+        )
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(all(question['category'] == 4 for question in data['questions']))
+
     def test_badrequest_search(self):
         res = self.client().post('questions/search')
         data = json.loads(res.data)
@@ -114,11 +193,140 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertTrue(data['question']['id'] not in li)
 
+    def test_quizzes_out_of_questions(self):
+        res = self.client().post(
+            '/quizzes',
+            json = {
+                "previous_questions": list(range(1, 100000)),
+                "quiz_category": {"id": 0}
+            }
+        )
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], False)
+
+    def test_quiz_session(self):
+        res = self.client().post(
+            '/quizzes/sessions',
+            json = {"quiz_category": {"id": 0}}
+        )
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['session_id'])
+
+        seen = []
+        for _ in range(data['total_questions']):
+            res = self.client().post('/quizzes/sessions/{}/next'.format(data['session_id']))
+            question = json.loads(res.data)['question']
+            self.assertTrue(question['id'] not in seen)
+            seen.append(question['id'])
+
+        res = self.client().post('/quizzes/sessions/{}/next'.format(data['session_id']))
+        self.assertEqual(json.loads(res.data)['success'], False)
+
+    def test_quiz_session_deals_new_questions(self):
+        self.client().post('/quizzes/sessions', json = {"quiz_category": {"id": 1}})
+        question = Question('Dealt after the deck was cached?', 'Yes', 1, 1)
+        question.insert()
+        self.addCleanup(question.delete)
+
+        res = self.client().post('/quizzes/sessions', json = {"quiz_category": {"id": 1}})
+        data = json.loads(res.data)
+        dealt = [json.loads(self.client().post('/quizzes/sessions/{}/next'.format(data['session_id'])).data)['question']['id']
+                 for _ in range(data['total_questions'])]
+        self.assertIn(question.id, dealt)
+
+    def test_404_quiz_session(self):
+        res = self.client().post('/quizzes/sessions/unknown/next')
+        self.assertEqual(res.status_code, 404)
+
     def test_badrequest_quizzes(self):
         res = self.client().post('/quizzes')
         data = json.loads(res.data)
         self.assertEqual(res.status_code, 422)
 
-# Make the tests conveniently executable
+    def test_import_rejects_invalid_records(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'questions.ndjson')
+        with open(path, 'w') as f:
+            f.write(json.dumps({'question': 'Imported with a real category?', 'answer': 'Yes',
+                                'category': 1, 'difficulty': 1}) + '\n')
+            f.write(json.dumps({'question': 'Imported with an unknown category?', 'answer': 'No',
+                                'category': 99999, 'difficulty': 1}) + '\n')
+            f.write('{"question": "Truncated\n')
+            f.write('[1, 2]\n')
+
+        result = self.app.test_cli_runner().invoke(args=['questions', 'import', path])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('unknown category 99999', result.output)
+        self.assertIn('3 invalid', result.output)
+
+
+class SQLiteSessionStoreTestCase(unittest.TestCase):
+    """Two workers sharing one quiz session file"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, 'quiz_sessions.db')
+        self.workers = [SQLiteSessionStore(path), SQLiteSessionStore(path)]
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.connection.close()
+        self.directory.cleanup()
+
+    def test_concurrent_workers_share_sessions(self):
+        session_ids = [self.workers[0].create(range(3000)) for _ in range(2)]
+        dealt = dict((session_id, []) for session_id in session_ids)
+        errors = []
+
+        def deal(worker, session_id):
+            try:
+                for _ in range(750):
+                    dealt[session_id].append(worker.next(session_id))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=deal, args=(self.workers[i % 2], session_ids[i // 2]))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for questions in dealt.values():
+            # Each question of a deck is dealt exactly once, whichever worker serves it.
+            self.assertEqual(len(questions), 1500)
+            self.assertEqual(len(set(questions)), 1500)
+
+    def test_least_recently_used_session_dropped_at_cap(self):
+        worker = SQLiteSessionStore(os.path.join(self.directory.name, 'capped.db'), max_sessions=2)
+        self.workers.append(worker)
+        first, second = worker.create(range(3)), worker.create(range(3))
+        worker.next(first)
+        third = worker.create(range(3))
+
+        self.assertIsNotNone(worker.next(first))
+        self.assertIsNotNone(worker.next(third))
+        with self.assertRaises(KeyError):
+            worker.next(second)
+
+
+class MemorySessionStoreTestCase(unittest.TestCase):
+    def test_least_recently_used_session_dropped_at_cap(self):
+        store = MemorySessionStore(max_sessions=2)
+        first, second = store.create(range(3)), store.create(range(3))
+        store.next(first)
+        third = store.create(range(3))
+
+        self.assertEqual(len(store.sessions), 2)
+        self.assertIsNotNone(store.next(first))
+        self.assertIsNotNone(store.next(third))
+        with self.assertRaises(KeyError):
+            store.next(second)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
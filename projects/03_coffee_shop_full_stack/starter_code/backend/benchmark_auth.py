@@ -0,0 +1,85 @@
+'''
+Throughput of authenticated GET /drinks-detail with and without the verified-token cache.
+
+Runs against a temporary SQLite database seeded with a small menu (the app drops and
+recreates its tables on import, so database.db is never touched) and a locally
+generated signing key, so no Auth0 tenant or network access is needed.
+
+    python benchmark_auth.py --requests 2000
+'''
+import argparse
+import os
+import tempfile
+import time
+
+import rsa
+from jose import jwk, jwt
+
+from src.database import models
+
+handle, database = tempfile.mkstemp(suffix='.db')
+os.close(handle)
+models.database_path = 'sqlite:///' + database
+
+from src.api import app  # noqa: E402 (must follow the database override)
+from src.auth import auth  # noqa: E402
+from src.auth.token_cache import TokenCache  # noqa: E402
+
+
+def seed(drinks):
+    with app.app_context():
+        for i in range(drinks):
+            models.Drink(title='drink {}'.format(i), recipe=[
+                {'name': 'espresso', 'color': 'brown', 'parts': 1},
+                {'name': 'milk', 'color': 'white', 'parts': 2}
+            ]).insert()
+
+
+def signed_token():
+    public, private = rsa.newkeys(2048)
+    key = jwk.construct(public.save_pkcs1().decode(), 'RS256').to_dict()
+    key.update({'kid': 'benchmark', 'use': 'sig'})
+    auth.jwks_store.keys = {'benchmark': key}
+    auth.jwks_store.expires = time.time() + 3600
+    claims = {
+        'aud': auth.API_AUDIENCE,
+        'iss': 'https://' + auth.AUTH0_DOMAIN + '/',
+        'exp': int(time.time()) + 3600,
+        'permissions': ['get:drinks-detail']
+    }
+    return jwt.encode(claims, private.save_pkcs1().decode(), algorithm='RS256', headers={'kid': 'benchmark'})
+
+
+def throughput(token, requests):
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer ' + token}
+    assert client.get('/drinks-detail', headers=headers).status_code == 200
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get('/drinks-detail', headers=headers)
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--drinks', type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        seed(args.drinks)
+        token = signed_token()
+        auth.token_cache = TokenCache(maxsize=0)
+        uncached = throughput(token, args.requests)
+        auth.token_cache = TokenCache()
+        cached = throughput(token, args.requests)
+    finally:
+        os.remove(database)
+
+    print('GET /drinks-detail, {} requests, {} drinks'.format(args.requests, args.drinks))
+    print('  without token cache: {:8.1f} requests/s'.format(uncached))
+    print('  with token cache:    {:8.1f} requests/s ({:.1f}x)'.format(cached, cached / uncached))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,18 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, request, jsonify, abort
 from sqlalchemy import exc
+from sqlalchemy.orm import selectinload
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db_drop_and_create_all, migrate_recipes, setup_db, Drink
+from .database.menu_cache import make_menu_store, menu_cache
 from .auth.auth import AuthError, requires_auth
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
+menu_cache.store = make_menu_store(os.environ)
 
 '''
 @TODO uncomment the following line to initialize the datbase
@@ -18,6 +21,35 @@ CORS(app)
 '''
 db_drop_and_create_all()
 
+'''
+flask migrate-recipes
+    moves recipes of a database created before the ingredients table into it
+    (comment out db_drop_and_create_all() above first, or the data is dropped on import)
+'''
+@app.cli.command('migrate-recipes')
+def migrate_recipes_command():
+    print('Migrated {} drinks.'.format(migrate_recipes()))
+
+'''
+menu_response(view)
+    serves the 'short' or 'long' drinks menu from menu_cache, with an ETag
+    clients revalidate with If-None-Match and get a 304 while the menu is unchanged
+'''
+def build_menu(view):
+    drinks = Drink.query.options(selectinload(Drink.ingredients)).order_by(Drink.id).all()
+    return json.dumps({
+        "success": True,
+        "drinks": [drink.short() if view == 'short' else drink.long() for drink in drinks]
+    }).encode()
+
+
+def menu_response(view, private=False):
+    body, etag = menu_cache.get(view, lambda: build_menu(view))
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache' if private else 'no-cache'
+    return response.make_conditional(request)
+
 ## ROUTES
 '''
 @TODO implement endpoint
@@ -29,12 +61,7 @@ db_drop_and_create_all()
 '''
 @app.route('/drinks')
 def get_drinks():
-    query = Drink.query.order_by(Drink.id).all()
-    drinks = [drink.short() for drink in query]
-    return jsonify({
-        "success": True,
-        "drinks": drinks
-    }), 200
+    return menu_response('short')
 
 '''
 @TODO implement endpoint
@@ -47,12 +74,7 @@ def get_drinks():
 @app.route('/drinks-detail')
 @requires_auth('get:drinks-detail')
 def get_drinks_detail(payload):
-    drinks = Drink.query.order_by(Drink.id).all()
-    drinks = [drink.long() for drink in drinks]
-    return jsonify({
-        "success": True,
-        "drinks": drinks
-    }), 200
+    return menu_response('long', private=True)
 
 '''
 @TODO implement endpoint
@@ -72,7 +94,11 @@ def post_drinks(payload):
 
     if title and recipe:
         try:
-            drink = Drink(title=title, recipe=json.dumps(recipe))
+            drink = Drink(title=title, recipe=recipe)
+        except ValueError:
+            abort(422)
+
+        try:
             drink.insert()
 
             return jsonify({
@@ -110,7 +136,10 @@ def patch_drink(payload, id):
         drink.title = body.get('title')
     
     if body.get('recipe'):
-        drink.recipe = json.dumps(body.get('recipe'))
+        try:
+            drink.recipe = body.get('recipe')
+        except ValueError:
+            abort(422)
     
     try:
         drink.update()
@@ -1,14 +1,31 @@
-import json
+import os
+import threading
+from collections import Counter
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from .jwks import JWKSKeyStore
+from .token_cache import TokenCache
 
 
 AUTH0_DOMAIN = 'fullcount.us.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'http://localhost:5000'
 
+# Signing keys are fetched once and cached; JWKS_CACHE_FILE keeps a copy so restarts start warm.
+jwks_store = JWKSKeyStore(
+    f'https://{AUTH0_DOMAIN}/.well-known/jwks.json',
+    cache_path=os.environ.get('JWKS_CACHE_FILE')
+)
+
+# Seconds of clock skew tolerated on exp/nbf, both when decoding and when serving cached tokens.
+LEEWAY = int(os.environ.get('JWT_LEEWAY', 0))
+
+# Verified tokens, so repeated calls with one bearer token skip signature verification.
+# TOKEN_CACHE_SIZE=0 disables it; token_cache.revoke(token) rejects a token before it expires.
+token_cache = TokenCache(maxsize=int(os.environ.get('TOKEN_CACHE_SIZE', 1024)), leeway=LEEWAY)
+
 ## AuthError Exception
 '''
 AuthError Exception
@@ -43,25 +60,63 @@ def get_token_auth_header():
             'description': 'Authorization malformed.'
         }, 401)
 
+## Permissions
+
+'''
+Claims
+    a decoded jwt payload (still a plain dict for the route handlers) that carries
+    the token's permissions as a frozenset, built once when the token is decoded
+    and cached with it in token_cache, so each check is a set lookup.
+    granted is None when the token has no permissions claim.
+'''
+class Claims(dict):
+    def __init__(self, payload):
+        super().__init__(payload)
+        self.granted = frozenset(payload['permissions']) if 'permissions' in payload else None
+
+
+# permission -> number of requests denied for lacking it, for monitoring.
+permission_denials = Counter()
+permission_denials_lock = threading.Lock()
+
+
+def denial_counts():
+    with permission_denials_lock:
+        return dict(permission_denials)
+
+
 '''
-@TODO implement check_permissions(permission, payload) method
+check_permissions(payload, all_of=(), any_of=())
     @INPUTS
-        permission: string permission (i.e. 'post:drink')
         payload: decoded jwt payload
+        all_of: permissions the token must all have
+        any_of: permissions of which the token must have at least one
 
     it should raise an AuthError if permissions are not included in the payload
         !!NOTE check your RBAC settings in Auth0
-    it should raise an AuthError if the requested permission string is not in the payload permissions array
+    it should raise an AuthError if a requirement is not met, counting each missing permission
     return true otherwise
 '''
-def check_permission(permission, payload):
-    if 'permissions' not in payload:
-        raise AuthError({
-            'code': 'invalid_claims',
-            'description': 'Permissions not included in JWT.'
-        }, 400)
+def check_permissions(payload, all_of=(), any_of=()):
+    if not all_of and not any_of:
+        return True
+
+    granted = getattr(payload, 'granted', None)
+    if granted is None:
+        if 'permissions' not in payload:
+            raise AuthError({
+                'code': 'invalid_claims',
+                'description': 'Permissions not included in JWT.'
+            }, 400)
+        granted = frozenset(payload['permissions'])
+
+    missing = [permission for permission in all_of if permission not in granted]
+    if any_of and granted.isdisjoint(any_of):
+        missing.extend(any_of)
 
-    if permission not in payload['permissions']:
+    if missing:
+        with permission_denials_lock:
+            permission_denials.update(missing)
         raise AuthError({
             'code': 'unauthorized',
             'description': 'Permission not found.'
@@ -69,24 +124,42 @@ def check_permission(permission, payload):
 
     return True
 
+
+def check_permission(permission, payload):
+    return check_permissions(payload, all_of=(permission,) if permission else ())
+
 '''
 @TODO implement verify_decode_jwt(token) method
     @INPUTS
         token: a json web token (string)
 
     it should be an Auth0 token with key id (kid)
-    it should verify the token using Auth0 /.well-known/jwks.json
+    it should verify the token using Auth0 /.well-known/jwks.json (cached in jwks_store)
     it should decode the payload from the token
     it should validate the claims
     return the decoded payload
+    verified payloads are cached in token_cache until the token expires
 
     !!NOTE urlopen has a common certificate error described here: https://stackoverflow.com/questions/50236117/scraping-ssl-certificate-verify-failed-error-for-http-en-wikipedia-org
 '''
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
+    if token_cache.is_revoked(token):
+        raise AuthError({
+            'code': 'token_revoked',
+            'description': 'Token revoked.'
+        }, 401)
+
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
 
-    unverified_header = jwt.get_unverified_header(token)
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except jwt.JWTError:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 400)
 
     rsa_key = {}
     if 'kid' not in unverified_header:
@@ -95,15 +168,15 @@ def verify_decode_jwt(token):
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    key = jwks_store.get(unverified_header['kid'])
+    if key is not None:
+        rsa_key = {
+            'kty': key['kty'],
+            'kid': key['kid'],
+            'use': key.get('use', 'sig'),
+            'n': key['n'],
+            'e': key['e']
+        }
 
     # Verification
     if rsa_key:
@@ -114,9 +187,12 @@ def verify_decode_jwt(token):
                 rsa_key,
                 algorithms=ALGORITHMS,
                 audience=API_AUDIENCE,
-                issuer='https://' + AUTH0_DOMAIN + '/'
+                issuer='https://' + AUTH0_DOMAIN + '/',
+                options={'leeway': LEEWAY}
             )
 
+            payload = Claims(payload)
+            token_cache.put(token, payload)
             return payload
 
         except jwt.ExpiredSignatureError:
@@ -143,23 +219,28 @@ def verify_decode_jwt(token):
             }, 400)
 
 '''
-@TODO implement @requires_auth(permission) decorator method
+@requires_auth(permission='', any_of=None, all_of=None) decorator method
     @INPUTS
         permission: string permission (i.e. 'post:drink')
+        any_of: the token needs at least one of these permissions
+        all_of: the token needs every one of these permissions (permission is added to them)
 
     it should use the get_token_auth_header method to get the token
     it should use the verify_decode_jwt method to decode the jwt
-    it should use the check_permissions method validate claims and check the requested permission
+    it should use the check_permissions method to check every requirement in one pass
     return the decorator which passes the decoded payload to the decorated method
 '''
-def requires_auth(permission=''):
+def requires_auth(permission='', any_of=None, all_of=None):
+    all_of = tuple(all_of or ()) + ((permission,) if permission else ())
+    any_of = frozenset(any_of or ())
+
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
             payload = verify_decode_jwt(token)
-            check_permission(permission, payload)
+            check_permissions(payload, all_of, any_of)
             return f(payload, *args, **kwargs)
 
         return wrapper
-    return requires_auth_decorator
\ No newline at end of file
+    return requires_auth_decorator
@@ -0,0 +1,85 @@
+import json
+import os
+import re
+import threading
+import time
+from urllib.request import urlopen
+
+'''
+JWKSKeyStore
+    in-memory cache of the identity provider's signing keys, indexed by key id (kid),
+    so verifying a token does not fetch /.well-known/jwks.json on every request.
+
+    - keys live for the Cache-Control max-age of the JWKS response (ttl when absent)
+    - an unknown kid or expired keys trigger a refresh, at most once per min_refresh_interval
+    - concurrent refreshes are single-flight: one thread fetches, the others wait and reuse its result
+    - if a refresh fails, the keys already cached keep being served
+    - cache_path, when set, warms the store at start-up and is rewritten after every fetch
+'''
+
+MAX_AGE = re.compile(r'max-age\s*=\s*(\d+)')
+
+
+class JWKSKeyStore:
+    def __init__(self, url, ttl=600, min_refresh_interval=30, timeout=5, cache_path=None):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.keys = {}  # kid -> JWK dict
+        self.expires = 0
+        self.last_fetch = None  # monotonic time of the last fetch attempt
+        self.generation = 0  # bumped after every successful fetch
+        self.lock = threading.Lock()
+        if cache_path and os.path.exists(cache_path):
+            try:
+                self.warm(cache_path)
+            except (OSError, ValueError) as e:
+                print(e)
+
+    def warm(self, path):
+        # Keys from a local JWKS file are used until the first refresh is due.
+        with open(path) as f:
+            self._store(json.load(f), self.ttl)
+
+    def get(self, kid):
+        # Returns the JWK for kid, or None if the provider does not publish it.
+        now = time.time()
+        key = self.keys.get(kid)
+        if key is not None and now < self.expires:
+            return key
+
+        generation = self.generation
+        with self.lock:
+            if self.generation != generation:
+                # Another thread refreshed while we were waiting.
+                return self.keys.get(kid)
+            if self._rate_limited():
+                return self.keys.get(kid)
+            try:
+                self.refresh()
+            except Exception as e:
+                # The provider is slow or down: serve what we have rather than fail every request.
+                print(e)
+        return self.keys.get(kid)
+
+    def refresh(self):
+        self.last_fetch = time.monotonic()
+        with urlopen(self.url, timeout=self.timeout) as response:
+            jwks = json.loads(response.read())
+            match = MAX_AGE.search(response.headers.get('Cache-Control') or '')
+        self._store(jwks, int(match.group(1)) if match else self.ttl)
+        if self.cache_path:
+            tmp = self.cache_path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(jwks, f)
+            os.replace(tmp, self.cache_path)
+
+    def _store(self, jwks, ttl):
+        self.keys = dict((key['kid'], key) for key in jwks.get('keys', []) if 'kid' in key)
+        self.expires = time.time() + ttl
+        self.generation += 1
+
+    def _rate_limited(self):
+        return self.last_fetch is not None and time.monotonic() - self.last_fetch < self.min_refresh_interval
@@ -0,0 +1,77 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+'''
+TokenCache
+    bounded LRU of tokens whose signature and claims were already verified,
+    so a client reusing one bearer token skips the RSA verification on every call.
+
+    - entries are keyed by the sha256 of the token; the token itself is never stored
+    - an entry is served until the token's exp claim plus leeway (the same clock skew
+      allowance used when decoding), then dropped; tokens without exp are not cached
+    - revoke(token) drops the entry and rejects the token until it would have expired anyway
+    - maxsize=0 disables caching
+'''
+
+
+def token_key(token):
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    def __init__(self, maxsize=1024, leeway=0):
+        self.maxsize = maxsize
+        self.leeway = leeway
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # token hash -> (payload, valid until)
+        self.revoked = {}  # token hash -> valid until
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        key = token_key(token)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token, payload):
+        if self.maxsize <= 0 or 'exp' not in payload:
+            return
+        key = token_key(token)
+        with self.lock:
+            self.entries[key] = (payload, payload['exp'] + self.leeway)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def revoke(self, token, exp=None):
+        # exp: the token's expiry, when known; revoked tokens are remembered until then.
+        key = token_key(token)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if exp is None:
+                exp = entry[0]['exp'] if entry is not None else now + 86400
+            self.revoked = dict((k, until) for k, until in self.revoked.items() if until > now)
+            self.revoked[key] = exp + self.leeway
+
+    def is_revoked(self, token):
+        if not self.revoked:
+            return False
+        with self.lock:
+            until = self.revoked.get(token_key(token))
+        return until is not None and until > time.time()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,123 @@
+import os
+import threading
+import uuid
+
+'''
+Menu snapshot cache
+    the drinks menu changes a few times a day but is read constantly, so the serialized
+    response body of each view ('short', 'long') is built once and kept as bytes
+    until Drink.insert/update/delete invalidates it.
+
+    Every snapshot is tagged with the store's version stamp, a random token replaced on
+    each invalidation. The stamp is read before the database is queried, so a snapshot built
+    while a write commits carries the old stamp and is discarded on the next read.
+    The stamp doubles as the ETag, so clients revalidating an unchanged menu get a 304.
+
+    MemoryMenuStore: per process (one worker, or tests)
+    FileMenuStore: stamp and snapshots in a directory shared by every worker on the host,
+        so an edit served by one gunicorn worker invalidates the menu of all of them
+'''
+
+
+class MemoryMenuStore:
+    def __init__(self):
+        self.stamp = uuid.uuid4().hex
+        self.snapshots = {}  # view -> (stamp, body)
+
+    def version(self):
+        return self.stamp
+
+    def invalidate(self):
+        self.stamp = uuid.uuid4().hex
+
+    def load(self, view, version):
+        snapshot = self.snapshots.get(view)
+        if snapshot is not None and snapshot[0] == version:
+            return snapshot[1]
+        return None
+
+    def save(self, view, version, body):
+        self.snapshots[view] = (version, body)
+
+
+class FileMenuStore:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.local = MemoryMenuStore()  # snapshots already read from disk by this worker
+        if not os.path.exists(self.path('version')):
+            self.invalidate()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def version(self):
+        try:
+            with open(self.path('version')) as f:
+                return f.read().strip()
+        except OSError:
+            self.invalidate()
+            return self.version()
+
+    def invalidate(self):
+        self.write('version', uuid.uuid4().hex.encode())
+
+    def load(self, view, version):
+        body = self.local.load(view, version)
+        if body is not None:
+            return body
+        try:
+            with open(self.path('menu-{}.json'.format(view)), 'rb') as f:
+                stamp, _, body = f.read().partition(b'\n')
+        except OSError:
+            return None
+        if stamp.decode() != version:
+            return None
+        self.local.save(view, version, body)
+        return body
+
+    def save(self, view, version, body):
+        self.write('menu-{}.json'.format(view), version.encode() + b'\n' + body)
+        self.local.save(view, version, body)
+
+    def write(self, name, data):
+        # Written aside and renamed, so other workers never read a partial file.
+        tmp = self.path('{}.{}.tmp'.format(name, uuid.uuid4().hex))
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.path(name))
+
+
+class MenuCache:
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+
+    def get(self, view, build):
+        # Returns (body bytes, etag); build() serializes the view from the database on a miss.
+        version = self.store.version()
+        with self.lock:
+            body = self.store.load(view, version)
+        if body is None:
+            body = build()
+            with self.lock:
+                self.store.save(view, version, body)
+        return body, '{}-{}'.format(view, version)
+
+    def invalidate(self):
+        with self.lock:
+            self.store.invalidate()
+
+
+'''
+make_menu_store(config)
+    MENU_CACHE_BACKEND: 'memory' (default, per process) or 'file' (shared by workers on one host)
+    MENU_CACHE_DIR: directory of the file backend
+'''
+def make_menu_store(config):
+    if config.get('MENU_CACHE_BACKEND', 'memory') == 'file':
+        return FileMenuStore(config.get('MENU_CACHE_DIR', 'menu_cache'))
+    return MemoryMenuStore()
+
+
+menu_cache = MenuCache(MemoryMenuStore())
@@ -1,8 +1,10 @@
 import os
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, inspect, text
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from .menu_cache import menu_cache
+
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
 database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
@@ -28,6 +30,83 @@ db_drop_and_create_all()
 def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
+    menu_cache.invalidate()
+
+'''
+migrate_recipes()
+    upgrades a database created before recipes were normalized:
+    copies every drink.recipe JSON blob into ingredients rows, then drops the column
+    (ALTER TABLE ... DROP COLUMN needs SQLite 3.35+ or PostgreSQL)
+    does nothing on a database that is already up to date
+'''
+def migrate_recipes():
+    db.create_all()
+    if 'recipe' not in [column['name'] for column in inspect(db.engine).get_columns('drink')]:
+        return 0
+
+    migrated = 0
+    rows = db.session.execute(text('SELECT id, recipe FROM drink')).fetchall()
+    for drink_id, recipe in rows:
+        if Ingredient.query.filter_by(drink_id=drink_id).count():
+            continue
+        for position, ingredient in enumerate(as_ingredients(recipe)):
+            ingredient.drink_id = drink_id
+            ingredient.position = position
+            db.session.add(ingredient)
+        migrated += 1
+    db.session.execute(text('ALTER TABLE drink DROP COLUMN recipe'))
+    db.session.commit()
+    menu_cache.invalidate()
+    return migrated
+
+
+'''
+as_ingredients(recipe)
+    builds Ingredient rows from a recipe given as a list of {'name', 'color', 'parts'} dicts,
+    a single such dict, or the legacy JSON string of either
+    raises ValueError if the recipe is malformed (e.g. an ingredient without a name, or non-numeric parts)
+'''
+def as_ingredients(recipe):
+    try:
+        if isinstance(recipe, str):
+            recipe = json.loads(recipe)
+        if isinstance(recipe, dict):
+            recipe = [recipe]
+        return [as_ingredient(r) for r in recipe]
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError('invalid recipe: {!r}'.format(e))
+
+
+def as_ingredient(r):
+    if not isinstance(r['name'], str) or not isinstance(r['color'], str):
+        raise TypeError('name and color must be strings')
+    return Ingredient(name=r['name'], color=r['color'], parts=float(r['parts']))
+
+
+'''
+Ingredient
+one line of a drink's recipe, in the order given by position
+'''
+class Ingredient(db.Model):
+    __tablename__ = 'ingredients'
+
+    id = Column(Integer, primary_key=True)
+    drink_id = Column(Integer, ForeignKey('drink.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)
+    name = Column(String(80), nullable=False)
+    color = Column(String(40), nullable=False)
+    parts = Column(Float, nullable=False)
+
+    def short(self):
+        return {'color': self.color, 'parts': self.whole_parts()}
+
+    def long(self):
+        return {'name': self.name, 'color': self.color, 'parts': self.whole_parts()}
+
+    def whole_parts(self):
+        # 2 parts serialize as 2 rather than 2.0, like the recipes clients send.
+        return int(self.parts) if self.parts.is_integer() else self.parts
+
 
 '''
 Drink
@@ -38,21 +117,34 @@ class Drink(db.Model):
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
-    # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe =  Column(String(180), nullable=False)
+    # the recipe, one Ingredient row per line; load with selectinload(Drink.ingredients) when listing
+    ingredients = db.relationship('Ingredient', order_by=Ingredient.position, cascade='all, delete-orphan')
+
+    '''
+    recipe
+        the recipe as [{'color': string, 'name':string, 'parts':number}]
+        assigning a list, a single ingredient dict or a legacy JSON string replaces the ingredients
+    '''
+    @property
+    def recipe(self):
+        return [ingredient.long() for ingredient in self.ingredients]
+
+    @recipe.setter
+    def recipe(self, recipe):
+        ingredients = as_ingredients(recipe)
+        for position, ingredient in enumerate(ingredients):
+            ingredient.position = position
+        self.ingredients = ingredients
 
     '''
     short()
         short form representation of the Drink model
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': [ingredient.short() for ingredient in self.ingredients]
         }
 
     '''
@@ -63,10 +155,13 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.recipe
         }
 
     '''
+    insert(), delete(), update()
+        commit, then invalidate the menu snapshots in menu_cache
+
     insert()
         inserts a new model into a database
         the model must have a unique name
@@ -78,6 +173,7 @@ class Drink(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        menu_cache.invalidate()
 
     '''
     delete()
@@ -90,6 +186,7 @@ class Drink(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        menu_cache.invalidate()
 
     '''
     update()
@@ -102,6 +199,7 @@ class Drink(db.Model):
     '''
     def update(self):
         db.session.commit()
+        menu_cache.invalidate()
 
     def __repr__(self):
         return json.dumps(self.short())
\ No newline at end of file
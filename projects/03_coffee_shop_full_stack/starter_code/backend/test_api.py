@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from src.database import models
+
+# src.api drops and recreates its tables on import, so point it at a throwaway file first.
+handle, database = tempfile.mkstemp(suffix='.db')
+os.close(handle)
+models.database_path = 'sqlite:///' + database
+
+from src.api import app  # noqa: E402 (must follow the database override)
+from src.auth import auth  # noqa: E402
+from src.auth.jwks import JWKSKeyStore  # noqa: E402
+from test_auth import make_key, make_token  # noqa: E402
+
+
+class DrinksTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.key, private_pem = make_key('key-1')
+        cls.token = make_token('key-1', private_pem, permissions=['post:drinks', 'patch:drinks'])
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(database)
+
+    def setUp(self):
+        self.original_store = auth.jwks_store
+        auth.jwks_store = JWKSKeyStore('http://127.0.0.1:9/unreachable')
+        auth.jwks_store._store({'keys': [self.key]}, 3600)
+        self.client = app.test_client()
+        self.headers = {'Authorization': 'Bearer ' + self.token}
+        with app.app_context():
+            models.db_drop_and_create_all()
+
+    def tearDown(self):
+        auth.jwks_store = self.original_store
+
+    def test_post_drink(self):
+        res = self.client.post('/drinks', headers=self.headers, json={
+            'title': 'Latte', 'recipe': [{'name': 'milk', 'color': 'white', 'parts': 2}]})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()['drinks']['recipe'], [{'name': 'milk', 'color': 'white', 'parts': 2}])
+
+    def test_422_post_malformed_recipe(self):
+        for recipe in ([{'color': 'white', 'parts': 2}], [{'name': 'milk', 'color': 'white', 'parts': 'lots'}]):
+            res = self.client.post('/drinks', headers=self.headers, json={'title': 'Latte', 'recipe': recipe})
+
+            self.assertEqual(res.status_code, 422)
+
+    def test_422_patch_malformed_recipe(self):
+        self.client.post('/drinks', headers=self.headers, json={
+            'title': 'Latte', 'recipe': [{'name': 'milk', 'color': 'white', 'parts': 2}]})
+
+        res = self.client.patch('/drinks/1', headers=self.headers, json={'recipe': [{'color': 'white', 'parts': 2}]})
+
+        self.assertEqual(res.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,282 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rsa
+from flask import Flask, jsonify
+from jose import jwk, jwt
+
+from src.auth import auth
+from src.auth.auth import AuthError, requires_auth, verify_decode_jwt
+from src.auth.jwks import JWKSKeyStore
+from src.auth.token_cache import TokenCache
+
+
+def make_key(kid):
+    public, private = rsa.newkeys(1024)
+    key = jwk.construct(public.save_pkcs1().decode(), 'RS256').to_dict()
+    key.update({'kid': kid, 'use': 'sig'})
+    return key, private.save_pkcs1().decode()
+
+
+def make_token(kid, private_pem, expires_in=60, permissions=('get:drinks-detail',)):
+    claims = {
+        'sub': 'auth0|barista',
+        'aud': auth.API_AUDIENCE,
+        'iss': 'https://' + auth.AUTH0_DOMAIN + '/',
+        'exp': int(time.time()) + expires_in,
+        'permissions': list(permissions)
+    }
+    return jwt.encode(claims, private_pem, algorithm='RS256', headers={'kid': kid})
+
+
+class JWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+        time.sleep(server.delay)
+        if server.down:
+            self.send_error(503)
+            return
+        body = json.dumps({'keys': server.keys}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if server.cache_control:
+            self.send_header('Cache-Control', server.cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class JWKSServer(ThreadingHTTPServer):
+    '''A local stand-in for the identity provider's /.well-known/jwks.json endpoint.'''
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), JWKSHandler)
+        self.lock = threading.Lock()
+        self.keys = []
+        self.hits = 0
+        self.delay = 0
+        self.down = False
+        self.cache_control = None
+        self.url = 'http://127.0.0.1:{}/.well-known/jwks.json'.format(self.server_port)
+
+
+class JWKSKeyStoreTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.key, cls.private_pem = make_key('key-1')
+        cls.rotated_key, cls.rotated_private_pem = make_key('key-2')
+
+    def setUp(self):
+        self.server = JWKSServer()
+        self.server.keys = [self.key]
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.original_store = auth.jwks_store
+        auth.token_cache.clear()
+
+    def tearDown(self):
+        auth.jwks_store = self.original_store
+        auth.token_cache.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keys_fetched_once_for_many_tokens(self):
+        auth.jwks_store = JWKSKeyStore(self.server.url)
+        token = make_token('key-1', self.private_pem)
+        for _ in range(5):
+            payload = verify_decode_jwt(token)
+
+        self.assertEqual(payload['permissions'], ['get:drinks-detail'])
+        self.assertEqual(self.server.hits, 1)
+
+    def test_cache_control_max_age_overrides_ttl(self):
+        self.server.cache_control = 'public, max-age=0'
+        store = JWKSKeyStore(self.server.url, ttl=3600, min_refresh_interval=0)
+        store.get('key-1')
+        store.get('key-1')
+
+        self.assertEqual(self.server.hits, 2)
+
+    def test_unknown_kid_refreshes_for_rotated_key(self):
+        store = JWKSKeyStore(self.server.url, min_refresh_interval=0)
+        store.get('key-1')
+        self.server.keys = [self.key, self.rotated_key]
+
+        self.assertEqual(store.get('key-2')['n'], self.rotated_key['n'])
+        self.assertEqual(self.server.hits, 2)
+
+    def test_unknown_kid_refresh_rate_limited(self):
+        store = JWKSKeyStore(self.server.url, min_refresh_interval=60)
+        store.get('key-1')
+        for _ in range(10):
+            self.assertIsNone(store.get('forged'))
+
+        self.assertEqual(self.server.hits, 1)
+
+    def test_concurrent_refresh_single_flight(self):
+        self.server.delay = 0.2
+        store = JWKSKeyStore(self.server.url)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store.get('key-1'))) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(result is not None for result in results))
+        self.assertEqual(self.server.hits, 1)
+
+    def test_warm_from_cache_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'jwks.json')
+            JWKSKeyStore(self.server.url, cache_path=path).get('key-1')
+            self.server.down = True
+            store = JWKSKeyStore(self.server.url, cache_path=path)
+
+            self.assertIsNotNone(store.get('key-1'))
+            self.assertEqual(self.server.hits, 1)
+
+    def test_stale_keys_served_when_provider_down(self):
+        store = JWKSKeyStore(self.server.url, ttl=0, min_refresh_interval=0)
+        store.get('key-1')
+        self.server.down = True
+
+        self.assertIsNotNone(store.get('key-1'))
+        self.assertEqual(self.server.hits, 2)
+
+    def test_unknown_key_rejected(self):
+        auth.jwks_store = JWKSKeyStore(self.server.url)
+        token = make_token('key-2', self.rotated_private_pem)
+
+        with self.assertRaises(AuthError) as context:
+            verify_decode_jwt(token)
+        self.assertEqual(context.exception.error['code'], 'invalid_header')
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.key, cls.private_pem = make_key('key-1')
+
+    def setUp(self):
+        self.original_store = auth.jwks_store
+        self.original_cache = auth.token_cache
+        auth.jwks_store = JWKSKeyStore('http://127.0.0.1:9/unreachable')
+        auth.jwks_store._store({'keys': [self.key]}, 3600)
+        auth.token_cache = TokenCache(maxsize=2)
+
+    def tearDown(self):
+        auth.jwks_store = self.original_store
+        auth.token_cache = self.original_cache
+
+    def test_repeated_token_served_from_cache(self):
+        token = make_token('key-1', self.private_pem)
+        first = verify_decode_jwt(token)
+        auth.jwks_store.keys = {}  # a cache miss would now fail to find the key
+
+        self.assertEqual(verify_decode_jwt(token), first)
+        self.assertEqual(auth.token_cache.hits, 1)
+
+    def test_expired_entry_not_served(self):
+        token = make_token('key-1', self.private_pem)
+        verify_decode_jwt(token)
+        key = list(auth.token_cache.entries)[0]
+        payload = auth.token_cache.entries[key][0]
+        auth.token_cache.entries[key] = (payload, time.time() - 1)
+
+        self.assertIsNone(auth.token_cache.get(token))
+        self.assertEqual(len(auth.token_cache.entries), 0)
+
+    def test_revoked_token_rejected(self):
+        token = make_token('key-1', self.private_pem)
+        verify_decode_jwt(token)
+        auth.token_cache.revoke(token)
+
+        with self.assertRaises(AuthError) as context:
+            verify_decode_jwt(token)
+        self.assertEqual(context.exception.error['code'], 'token_revoked')
+
+    def test_cache_bounded_lru(self):
+        tokens = [make_token('key-1', self.private_pem, expires_in=60 + i) for i in range(3)]
+        for token in tokens:
+            verify_decode_jwt(token)
+
+        self.assertEqual(len(auth.token_cache.entries), 2)
+        self.assertIsNone(auth.token_cache.get(tokens[0]))
+        self.assertIsNotNone(auth.token_cache.get(tokens[2]))
+
+
+class PermissionTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.key, cls.private_pem = make_key('key-1')
+        cls.app = Flask(__name__)
+
+        @cls.app.route('/menu')
+        @requires_auth(any_of=['patch:drinks', 'delete:drinks'], all_of=['get:drinks-detail'])
+        def menu(payload):
+            return jsonify({'success': True})
+
+        @cls.app.errorhandler(AuthError)
+        def auth_error(error):
+            return jsonify({'success': False, 'message': error.error['code']}), error.status_code
+
+    def setUp(self):
+        self.original_store = auth.jwks_store
+        auth.jwks_store = JWKSKeyStore('http://127.0.0.1:9/unreachable')
+        auth.jwks_store._store({'keys': [self.key]}, 3600)
+        auth.token_cache.clear()
+        auth.permission_denials.clear()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        auth.jwks_store = self.original_store
+        auth.token_cache.clear()
+
+    def get(self, permissions):
+        token = make_token('key-1', self.private_pem, permissions=permissions)
+        return self.client.get('/menu', headers={'Authorization': 'Bearer ' + token})
+
+    def test_composite_requirement_met(self):
+        res = self.get(['get:drinks-detail', 'delete:drinks'])
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(auth.denial_counts(), {})
+
+    def test_403_any_of_not_met(self):
+        res = self.get(['get:drinks-detail'])
+
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(auth.denial_counts(), {'patch:drinks': 1, 'delete:drinks': 1})
+
+    def test_403_all_of_not_met(self):
+        res = self.get(['patch:drinks'])
+
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(auth.denial_counts(), {'get:drinks-detail': 1})
+
+    def test_permissions_frozen_once_per_token(self):
+        token = make_token('key-1', self.private_pem)
+        payload = verify_decode_jwt(token)
+
+        self.assertEqual(payload.granted, frozenset(['get:drinks-detail']))
+        self.assertIs(verify_decode_jwt(token).granted, payload.granted)
+
+    def test_400_missing_permissions_claim(self):
+        with self.assertRaises(AuthError) as context:
+            auth.check_permission('get:drinks-detail', {'sub': 'auth0|barista'})
+        self.assertEqual(context.exception.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import tempfile
+import unittest
+
+from src.database.menu_cache import FileMenuStore, MemoryMenuStore, MenuCache
+
+
+class MenuCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.builds = 0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build(self):
+        self.builds += 1
+        return 'menu {}'.format(self.builds).encode()
+
+    def test_snapshot_reused_until_invalidated(self):
+        cache = MenuCache(MemoryMenuStore())
+        body, etag = cache.get('short', self.build)
+
+        self.assertEqual(cache.get('short', self.build), (body, etag))
+        cache.invalidate()
+        self.assertNotEqual(cache.get('short', self.build)[1], etag)
+        self.assertEqual(self.builds, 2)
+
+    def test_file_store_shared_between_workers(self):
+        worker = MenuCache(FileMenuStore(self.directory.name))
+        other_worker = MenuCache(FileMenuStore(self.directory.name))
+        body, etag = worker.get('long', self.build)
+
+        self.assertEqual(other_worker.get('long', self.build), (body, etag))
+        self.assertEqual(self.builds, 1)
+
+    def test_file_store_invalidation_seen_by_other_workers(self):
+        worker = MenuCache(FileMenuStore(self.directory.name))
+        other_worker = MenuCache(FileMenuStore(self.directory.name))
+        worker.get('short', self.build)
+        other_worker.get('short', self.build)
+        worker.invalidate()
+
+        self.assertEqual(other_worker.get('short', self.build)[0], b'menu 2')
+
+    def test_snapshot_built_during_write_discarded(self):
+        store = MemoryMenuStore()
+        cache = MenuCache(store)
+
+        def build_racing_write():
+            store.invalidate()  # a write commits while the menu is being serialized
+            return self.build()
+
+        cache.get('short', build_racing_write)
+        self.assertEqual(cache.get('short', self.build)[0], b'menu 2')
+
+
+if __name__ == "__main__":
+    unittest.main()